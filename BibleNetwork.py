@@ -1,40 +1,67 @@
 
 import networkx as nx
 import json
-from random import choice
-from cooccurence import Co_Occurence
+from random import randrange
+from cooccurence import Co_Occurence, Co_Occurence_Window
 from statistics import mode
-from strongs import StrongsDict
-import re
+from strongs import get_strongs_dict
+from verse_store import open_verses
+from references import VerseLookup
+from books import BookResolver
+from autocomplete import Autocomplete
+from fulltext import open_fulltext
+from concordance import open_concordance
+from cooccurence_matrix import open_cooccurence_matrix
+from topics import open_topics, sanitise
+from crossref_graph import open_crossrefs
+from subgraph_index import open_subgraph_index
+from cache import LRUCache
+from subgraph import Subgraph
+from centrality import centrality_measures
 
 URL = "" # if native
 
 URL = "https://biblenetwork.s3.us-east-2.amazonaws.com/" # if online
 
+# The (factor, cutoff) pairs tried by get_best_subgraph
+SUBGRAPH_PAIRS = [(0.35, 5), (0.55, 4), (0.65, 2), (0.85, 0)] # (0.35, 7) is good for densely connected verses, but not good for sparse verses
+SUBGRAPH_ALGORITHM = 1 # change whenever the subgraphs change (e.g. _tune_cluster or _get_search_cutoff), so subgraphs.bin is rebuilt
+
 class BibleNetwork:
     """A network of the bible where verses are nodes."""
     def __init__(self):
         print("Building BibleNetwork...")
-        self.bible = nx.DiGraph()
 
         self.strongs_enabled = True
 
         if self.strongs_enabled:
             print("Retrieving Strongs Dictionary...")
-            self.strongs_dict = StrongsDict()
+            self.strongs_dict = get_strongs_dict() # shared by every BibleNetwork
         else:
             print("Did not build Strongs Dictionary...")
 
         self.nodes_path = [r"nodes1.json", r"nodes2.json", r"nodes3.json", r"nodes4.json"]
         # self.nodes_path = r"nodes1.json"
+        self.verses_path = r"verses.bin" # compiled from nodes_path
         self.crossrefs_path = [r"edges.json", r"edges2.json"]
+        self.crossrefs_bin_path = r"crossrefs.bin" # compiled from crossrefs_path
+        self.subgraphs_path = r"subgraphs.bin" # precomputed by subgraph_index.py
+        self.taxonomy_path = r"bible.json"
+        self.topics_path = r"topics.bin" # built from verses_path
+        self.fulltext_path = r"fulltext.bin" # built from verses_path
+        self.concordance_path = r"concordance.bin" # built from verses_path (on first use)
+        self.concordance = None
+        self.cooccurence_path = r"cooccurence.bin" # built from verses_path (on first use)
+        self.cooccurence_matrix = None
+        self.cache = LRUCache(max_items=2048, max_bytes=64 * 1024 * 1024) # subgraphs and topics of popular verses
 
         print("Loading Bible...")
         self._init_verses()
         print("Building cross references...")
         self._init_crossrefs()
+        self._init_subgraphs()
         self._first_id = 0
-        self._last_id = len(self.bible.nodes()) - 1
+        self._last_id = len(self.verses) - 1
         self.active = self.get_random_node() # set random verse as active node
                 
     def get_active(self):
@@ -46,59 +73,25 @@ class BibleNetwork:
     
     def get_id_by_name(self, verse):
         """Lookup the id of a verse based on a given reference e.g. Matt.3.3"""
-        # Initialise verse lookup 
-        path = "verse_lookup.json"
-        with open(path, 'r') as config_file:
-            lookup = json.load(config_file)
+        return self.lookup.get_id(verse)
 
-        # Conduct lookup and return ID
-        return lookup[verse] if verse in lookup else ""
+    def get_ids_by_name(self, verses):
+        """Lookup the ids of a list of references (an id is "" if the reference does not exist)."""
+        return self.lookup.get_ids(verses)
     
     def get_taxonomy(self):
         """Get a dictionary of bible books and their keys."""
-        path = "bible.json"
-        with open(path, 'r') as config_file:
-            bible_taxonomy = json.load(config_file)
-        return bible_taxonomy
+        return self.books.taxonomy
     
     def _decode_search(self, search):
         """Parse the search and return a possible search result."""
-        search = search.strip()
-        search = re.sub(r'[^(\.\w :)]', '', search) # delete specials
-        search = re.sub(r'[ ]+', ' ', search) # remove double spaces
-        search = search.replace(':', '.').replace(' ', '.')
-        search = search.replace('1 ', '1').replace('2 ', '2').replace('3 ', '3') # parse 1 corinthians etc
-        search = search.split('.', 3)
-        print(f"search: {search}")
-
-        if len(search) < 3 :
-            return ""
-        
-        if search[0] in ['1', '2', '3'] :
-            num, bk, ch, vs = search[:4]
-            bk = bk.capitalize()
-            bk = f"{num} {bk}"
-        else :
-            bk, ch, vs = search[:3]
-            bk = bk.capitalize()
-
-        taxonomy = self.get_taxonomy()
-        print(f"!!DOUBLE {bk}")
-        bk = self.get_book_by_search(bk, taxonomy)
-        
-        if bk == "": 
-            return ""
-        
-        print(f"!BANG {bk}.{ch}.{vs}")
-        
-        return f"{bk}.{ch}.{vs}"
+        reference = self.books.parse(search)
+        print(f"search: {search} reference: {reference}")
+        return reference
 
-    def get_book_by_search(self, search, taxonomy):
+    def get_book_by_search(self, search, taxonomy=None):
         """From a given search request, returns the book id."""
-        search = search.lower()
-        for book, items in taxonomy.items():
-            if search in items['spellings']:
-                return taxonomy[book]['short']        
+        return self.books.resolve(search)
 
     def get_id_by_search(self, search):
         """From a given search request, returns the verse id."""
@@ -106,6 +99,36 @@ class BibleNetwork:
         id = self._decode_search(search)
         id = self.get_id_by_name(id) if id != "" else "" # if a valid reference is found
         return id
+
+    def get_id_by_text(self, search):
+        """From a submitted search, returns the verse id of the reference, of the closest reference (e.g. a
+        misspelled book), or otherwise of the best match in the text of the bible (e.g. "bread of life")."""
+        id = self.get_id_by_search(search)
+        if id == "" and search:
+            reference = self.autocomplete.correct(search) # e.g. Ecclesssia 4.11 -> Eccl.4.11
+            id = self.get_id_by_name(reference) if reference != "" else ""
+        if id == "" and search and search.strip():
+            results = self.search_text(search, limit=1)
+            id = results[0]['id'] if results else ""
+
+        return id
+
+    def search_text(self, query, limit=10):
+        """Returns the verses that best match the words of the query as a list of {"id", "score", "snippet"}."""
+        return self.get_fulltext().search(query, limit)
+
+    def get_fulltext(self):
+        """Returns the full-text index."""
+        return self.fulltext
+
+    def get_suggestions(self, search, limit=5):
+        """Returns a ranked list of references that could complete the search (see Autocomplete.suggest)."""
+        return self.autocomplete.suggest(search, limit)
+
+    def get_ids_by_search(self, searches):
+        """From a list of search requests, returns the verse ids (an id is "" if the search is invalid)."""
+        references = self.books.parse_many(["" if search is None else search for search in searches])
+        return self.lookup.get_ids(references)
     
     def get_passage_by_search(self, search_start, search_end):
         """From a given search request, returns the passage."""
@@ -129,25 +152,24 @@ class BibleNetwork:
         while count < len(path):
             x = path[count - 1]
             y = path[count]
-            edges.append(self.bible.edges[x,y])
+            edges.append(self.crossrefs.get_edge(x, y))
             count += 1 
 
         return edges
 
     def get_path_passages(self, path):
         """Get the passages of the given path."""
-        edges = self.get_edges(path)
-        edges.insert(0, {'end': ''}) # initialise with starting verse
+        ends = [-1] + self.crossrefs.get_ends(path) # initialise with starting verse
         passages = []
         
-        for i, edge in enumerate(edges):
-            # Get start and end ids
-            start = path[i]
-            end = start if edge['end'] == '' else self.get_id_by_name(edge['end']) 
-
-            # Get passage           
-            passage = self.get_passage(start, end)
-            data = {'passage': passage['passage'], 'name': passage['name'], 'start': start, 'end': end}
+        for start, end in zip(path, ends):
+            # Get start and end ids (the end of each cross-reference is pre-resolved)
+            end = start if end == -1 else end
+            x, y = (end, start) if start > end else (start, end)
+
+            # Get passage
+            passage = self.verses.get_passage(x, y).strip(" ")
+            data = {'passage': passage, 'name': self.get_passage_name(x, y), 'start': start, 'end': end}
             passages.append(data)
 
         return passages
@@ -157,19 +179,19 @@ class BibleNetwork:
         if start == end : # If not a passage
             return self.get_fullname(start)
         
-        # If a passage, get data
+        # If a passage, get the book, chapter and verse of each end
         taxonomies = ['book', 'chap', 'verse']
         name = f"{self.get_fullname(start)}-"
-        start = self.get_node(start)
-        end = self.get_node(end)
+        start = self.verses.get_reference(start)
+        end = self.verses.get_reference(end)
         diff = False
 
         # Build the name
-        for taxonomy in taxonomies:
-            if start[taxonomy] != end[taxonomy]:
+        for i, taxonomy in enumerate(taxonomies):
+            if start[i] != end[i]:
                 diff = True               
             if diff:
-                name += end[taxonomy]
+                name += end[i]
                 name += " " if taxonomy == "book" else ""
                 name += ":" if taxonomy == "chap" else "" 
 
@@ -180,59 +202,50 @@ class BibleNetwork:
         # Initialise
         active = active if active != '' else x
         start, end = (y, x) if x > y else (x, y) # ensure start id is always smaller
-        verses = []
-        ids = []
-        verses_as_string = ""
         name = self.get_passage_name(start, end)
 
-        # Iterate through start to end
-        while start <= end :
-            verse = self.get_verse(start)
-            verses.append(verse)
-            ids.append(start)
-            verses_as_string += f" {verse}"
-            start += 1
+        # The verses from start to end are stored together (separated by a space)
+        verses = self.verses.get_contents(start, end)
+        passage = self.verses.get_passage(start, end)
+        ids = list(range(start, end + 1))
 
-        return {"name": name, "passage": verses_as_string.strip(" "), "verses": verses, "ids": ids, "active": active}
+        return {"name": name, "passage": passage.strip(" "), "verses": verses, "ids": ids, "active": active}
 
     def get_name(self, id=""):
         """Get name of given verse by id, or active verse if no id is supplied."""
-        return self.active["name"] if id == "" else self.get_node(id)["name"]
+        return self.active["name"] if id == "" else self.verses.get_name(id)
         
     def get_fullname(self, id=""):
         """Get formatted name of given verse by id, or get active verse if no id is supplied."""
         if id == "":
             book, chap, verse = (self.active["book"], self.active["chap"], self.active["verse"])
         else:
-            book, chap, verse = (self.get_node(id)["book"], self.get_node(id)["chap"], self.get_node(id)["verse"])
+            book, chap, verse = self.verses.get_reference(id)
 
         return f"{book} {chap}:{verse}"
     
     def get_dictname(self, id=""):
         id = self.get_id() if id == "" else id
         return {
-                "bk": self.get_node(id)["book"].replace(" ", "-"),
-                "ch": self.get_node(id)["chap"],
-                "vs": self.get_node(id)["verse"]
+                "bk": self.verses.get_book(id).replace(" ", "-"),
+                "ch": self.verses.get_chap(id),
+                "vs": self.verses.get_verse(id)
                 }
     
     def sanitise(self, text):
-        return ''.join(char for char in text if char.isalnum())
+        return sanitise(text)
     
     def get_topics(self, id=""):
         """Get verse of given verse by id (e.g. 340). Get active verse if no id is supplied."""
-        topics = self.active["topics"] if id == "" else self.get_node(id)["topics"]
-        new = {self.sanitise(topic): weight
+        if id != "":
+            return self.topics.get_topics(id) # pre-sanitised
 
-            for topic, weight in (topics)
-        }
-        # print(f"topics!!! {new}")
-        return new
+        return {self.sanitise(topic): weight for topic, weight in self.active["topics"]}
         # return sorted(topics, key=lambda x: x[1], reverse=True)
         
     def get_verse(self, id=""):
         """Get verse of given verse by id (e.g. 340). Get active verse if no id is supplied."""
-        return self.active["content"] if id == "" else self.get_node(id)["content"]
+        return self.active["content"] if id == "" else self.verses.get_content(id)
     
     def get_context(self, id=""):
         """Get verse, and the verse before and after this verse."""
@@ -249,8 +262,10 @@ class BibleNetwork:
         verse_eng = []
         verse_trans = []
         strongs = []
-        for word in self.get_node(id)['strongs']:
-            if no_stopwords and word['stop_word']:
+        words = self.verses.get_strongs(id)
+        stops = self.get_stop_mask(words) if no_stopwords else []
+        for i, word in enumerate(words):
+            if no_stopwords and stops[i]:
                 continue # do not include stop words
             else:
                 x = word['lemma']
@@ -261,78 +276,64 @@ class BibleNetwork:
 
         return {"strongs": strongs, "lemma": verse, "translit": verse_trans, "english": verse_eng}
 
+    def get_stopwords(self):
+        """Returns the stop words of the strongs dictionary (see stopwords.py), or None if strongs are not enabled."""
+        return self.strongs_dict.get_stopwords() if self.strongs_enabled else None
+
+    def get_stop_mask(self, words):
+        """Returns whether each word (as returned by VerseStore.get_strongs) is a stop word. Without the strongs
+        dictionary, these are the stop words classified when the verses were converted."""
+        stopwords = self.get_stopwords()
+        if stopwords is None:
+            return [word['stop_word'] for word in words]
+        return stopwords.stop_mask([word.get('sn', '') for word in words])
+
+    def get_concordance(self):
+        """Returns the strongs concordance (it is opened on first use)."""
+        if self.concordance is None:
+            strongs_dict = self.strongs_dict if self.strongs_enabled else None
+            self.concordance = open_concordance(self.verses, strongs_dict, self.concordance_path)
+        return self.concordance
+
+    def get_ids_by_strongs(self, sn):
+        """Get a list of the ids of every verse that uses a strongs number (e.g. G26)."""
+        return self.get_concordance().get_verses(sn).tolist()
+
     def get_node(self, id):
         """Returns the node data of a given id"""
-        return self.bible.nodes(data=True)[id]
+        return self.verses.get_node(id)
     
-    def get_crossrefs(self, id=""):
-        """Sorted by weights"""
-        return sorted(self._get_crossrefs(id=id).items(), key=lambda x: x[1]['weight'], reverse=True)
+    def get_crossrefs(self, id="", how_many=None):
+        """Sorted by weights (the top how_many, if given)"""
+        id = self.get_id() if id == "" else id
+        return self.crossrefs.get_crossrefs(id, how_many) # pre-sorted
     
     def get_crossrefs_ids(self, id="", how_many=100, preprocess=False):
         """Get a list of crossref ids of a given id."""
-        crossrefs = self.get_crossrefs(id=id)
-        crossrefs = self._remove_low_quality_crossrefs(crossrefs[:how_many+5]) if preprocess else crossrefs
-        crossrefs = crossrefs[:how_many]
-
-        ids = {x for x, data in crossrefs}
-        return ids
-    
-    def _remove_low_quality_crossrefs(self, crossrefs):
-        """Remove cross-references that are low quality (i.e. they have not received many votes)"""
-        # Check if crossrefs exist
-        total = len(crossrefs)
-        if total == 0:
-            return crossrefs
-        
-        # Get diversity
-        weights = [crossref[1]['weight'] for crossref in crossrefs]
-        uniqueness = len(set(weights))
-        diversity = uniqueness / total
-
-        if diversity < 0.45:
-            # Remove low-quality crossrefs
-            # Example: [100, 92, 82, 71, 71, 71, 71, 71, 71] ---> [100, 92, 82]
-            crossrefs = self._remove_crossrefs_by_weight(crossrefs, {weights[-1]})
-
-        return crossrefs                
-
-    def _remove_crossrefs_by_weight(self, crossrefs, weights={}):
-        """Remove crossrefs with the given weight/s"""
-        new_crossrefs = []
-
-        # Remove any verse with the given weight
-        for crossref in crossrefs:
-            significant = crossref[1]['weight'] > 86 # Do not remove "100" weights
-            if significant:
-                new_crossrefs.append(crossref)
-            elif crossref[1]['weight'] not in weights:
-                new_crossrefs.append(crossref)
-
-        return new_crossrefs
+        id = self.get_id() if id == "" else id
+        return set(self.crossrefs.select(id, how_many, preprocess).tolist())
 
     def count_topics(self, G, weighted=True, sort=True):
         """Get a count matrix for topics in a given subgraph."""
-        counter = {}
-        for verse, topics in list(G.nodes(data="topics")):
-            for topic, weight in topics:
-                # count the topics
-                weight = weight / 100 + 1 if weighted else 1
-                if topic in counter:
-                    counter[topic] += 1 * weight
-                else:
-                    counter[topic] = 1 * weight
-        
-        # sort dictionary
-        if sort: 
-            return dict(sorted(counter.items(), key=lambda x: x[1], reverse=True))
-        return counter
+        return dict(self.topics.count(G.nodes, weighted, sort=sort))
+
+    def get_topic_verses(self, topic, k=10):
+        """Get the verses with the highest weight for a topic (e.g. kingdomofgod) as a list of (id, weight)."""
+        return self.topics.top_verses(topic, k)
+
+    def get_ids_by_topic(self, topic, ids):
+        """Get the given ids that have a topic (e.g. the nodes of a subgraph to highlight for a theme)."""
+        return self.topics.filter(topic, ids)
 
     def get_related_topics(self, id="", k=15):
         """Get the topics (k = max) of verses related to the given verse. Returns a sorted dictionary of topics."""
+        id = self.get_id() if id == "" else id
+        topics = self.cache.get_or_compute(("related_topics", id, k), lambda: self._get_related_topics(id, k))
+        return dict(topics) # a copy, so the cached topics cannot be changed
+
+    def _get_related_topics(self, id, k):
         subgraph = self.get_best_subgraph(id=id) #
-        topics = self.count_topics(subgraph)
-        return {x: topics[x] for x in list(topics)[:k]}
+        return dict(self.topics.count(subgraph.nodes, k=k))
     
     def get_related_adj_subgraph(self, factor=1, id=""):
         id = self.get_id() if id == "" else id
@@ -346,7 +347,7 @@ class BibleNetwork:
         
         Return: The form of [distance, [source_id, ..., target_id]]"""
         if graph is None:
-            graph = self.bible
+            return self.crossrefs.shortest_path(source, target)
 
         return nx.single_source_dijkstra(graph, source=source, target=target, weight=self._weight_function)
     
@@ -363,16 +364,54 @@ class BibleNetwork:
 
         return serendipity  
     
-    def get_best_subgraph(self, id):
+    def get_best_subgraph(self, id, layout=False):
+        """Get the best subgraph of a verse (as an immutable Subgraph). Uses the precomputed subgraph index if it exists.
+
+        layout -- If True, add a position to each node (see get_layout)."""
+        subgraph = self.cache.get_or_compute(("best_subgraph", id), lambda: self._get_best_subgraph(id))
+        return self.get_layout(subgraph) if layout else subgraph
+
+    def _get_best_subgraph(self, id):
+        if self.subgraph_index is not None:
+            nodes, lengths, paths = self.subgraph_index.get(id)
+            return self._build_subgraph(nodes, lengths, paths, active=id)
+
         return self._optimise_subgraph(id)
     
     def get_related_subgraph_force_crossrefs(self, factor=1, id="", how_many=-1):
         """Get subgraph containing the given crossreferences"""
-        crossrefs = self.get_crossrefs_ids(id=id, how_many=how_many, preprocess=True)
-        crossrefs.add(id)
-        return self.get_related_subgraph(id=crossrefs, active=id, factor=factor)
+        return self._get_candidate_subgraphs(id, [(factor, how_many)])[(factor, how_many)]
+
+    def _get_candidate_subgraphs(self, id, pairs):
+        """Get a subgraph containing the given crossreferences for every (factor, how_many) pair.
+        Every subgraph shares a single dijkstra. Returns {(factor, how_many): subgraph}"""
+        sources = []
+
+        for factor, how_many in pairs:
+            ids = self.get_crossrefs_ids(id, how_many=how_many, preprocess=True)
+            ids.add(id)
+            sources.append(ids)
+
+        # Search far enough for the largest factor
+        cutoff = self._get_search_cutoff(max(factor for factor, how_many in pairs))
+        searches = self.crossrefs.search_many(sources, cutoff)
+
+        graphs = {}
+        for (factor, how_many), search in zip(pairs, searches):
+            cluster = self._tune_cluster(search, factor)
+            graphs[(factor, how_many)] = self._convert_cluster_to_subgraph(cluster, id)
+
+        return graphs
     
-    def get_path_related_subgraph(self, id1="", id2=""):
+    def get_path_related_subgraph(self, id1="", id2="", layout=False):
+        """Get subgraph of verses related to the shortest path between id1 and id2 (as an immutable Subgraph).
+
+        layout -- If True, add a position to each node (see get_layout)."""
+        key = ("path_related_subgraph", id1, id2)
+        subgraph = self.cache.get_or_compute(key, lambda: self._get_path_related_subgraph(id1, id2))
+        return self.get_layout(subgraph) if layout else subgraph
+
+    def _get_path_related_subgraph(self, id1, id2):
         ids = self.get_shortest_path(source=id1, target=id2)[1]
         return self.get_related_subgraph(id=ids, active=id1, shortest_path=ids)
     
@@ -388,34 +427,38 @@ class BibleNetwork:
         # Parse data
         id = {id} if type(id) is int else set(id)
         # active = {active} if type(active) is int else set(active)
-        nodes = self._get_cluster(factor, id)[0]
+
+        # Get subgraph
+        cluster = self._tune_cluster(self._search_cluster(factor, id), factor)
+        return self._convert_cluster_to_subgraph(cluster, active, shortest_path=shortest_path)
+
+    def _tune_cluster(self, search, factor):
+        """Adjust the factor until the cluster has a good size. Returns the cluster (nodes, length, paths).
+
+        search -- A ClusterSearch that reaches at least _get_search_cutoff(factor)."""
+        # The cluster of any factor is a prefix of the search, so each step is a binary search.
+        size = lambda factor: search.size(self._get_cutoff(factor))
         count = 0
         count_k = 0
 
         # Be more sensitive
-        while len(nodes) < 3 and count_k < 5:
+        while size(factor) < 3 and count_k < 5:
             factor = factor + 0.3
-            nodes = self._get_cluster(factor, id)[0]
             count_k += 1
 
-        while len(nodes) < 15 and count < 5:
+        while size(factor) < 15 and count < 5:
             factor = factor + 0.1
-            nodes = self._get_cluster(factor, id)[0]
             count += 1
 
-        # Be less sensitive
-        while len(nodes) > 25:
+        # Be less sensitive (a negative factor cannot remove the given ids, so stop there)
+        while size(factor) > 25 and factor > 0:
             factor = factor - 0.05
-            nodes = self._get_cluster(factor, id)[0]
 
-        # Get subgraph
-        cluster = self._get_cluster(factor, id)
-        return self._convert_cluster_to_subgraph(cluster, active, shortest_path=shortest_path)
+        return search.get(self._get_cutoff(factor))
     
-    def _convert_cluster_to_subgraph(self, cluster, active, get_attribs=True, shortest_path=None):
-        """Convert cluster into subgraph. If attribs = True, add extra attributes to each node."""
+    def _convert_cluster_to_subgraph(self, cluster, active, shortest_path=None):
+        """Convert cluster into subgraph, with the path and length between the active node and each node."""
         nodes, lengths, paths = cluster
-        subgraph = self.bible.subgraph(nodes)
 
         # print(f"nodes: {nodes}\n lengths: {lengths} \n paths: {paths}")
 
@@ -446,32 +489,47 @@ class BibleNetwork:
                 #     path = path[::-1] + n2 if len(path) == 1 else n1 + path # n2[::-1] + path
                 # path = n1 + path if len(n1) < len(n2) else path[::-1] + n2 # This is the shorter path
 
-            elif path[0] is not active:
+            elif path[0] != active:
                 path.insert(0, active)
             paths[key] = path 
 
         # print(f"Paths {paths}")
 
-        if get_attribs:
-            pos = nx.spring_layout(subgraph)
-            nx.set_node_attributes(subgraph, pos, 'position') # default position
-            nx.set_node_attributes(subgraph, paths, 'path') # path between initial node and this node
-            nx.set_node_attributes(subgraph, lengths, 'length') # length of path between initial node and this node
+        return self._build_subgraph(nodes, lengths, paths, active)
+
+    def _build_subgraph(self, nodes, lengths, paths, active):
+        """Build an immutable Subgraph of the given nodes (without a layout)."""
+        edges = self.crossrefs.edges_between(nodes)
+        return Subgraph(nodes, edges, paths, lengths, active=active)
+
+    def get_layout(self, subgraph):
+        """Returns a copy of the subgraph with a position for each node (i.e. a spring layout).
 
-        return subgraph
+        Layouts are not needed to draw the graph (the fcose layout runs in the browser), so they are only
+        computed when requested. They are seeded, so the same subgraph always has the same (cached) layout."""
+        key = ("layout", subgraph.nodes, subgraph.edges)
+        positions = self.cache.get_or_compute(key, lambda: self._spring_layout(subgraph))
+        return subgraph.with_positions(positions)
+
+    def _spring_layout(self, subgraph):
+        pos = nx.spring_layout(subgraph.to_networkx(), seed=0)
+        return {node: tuple(float(x) for x in position) for node, position in pos.items()}
     
     def _optimise_subgraph(self, id):
         """Select the subgraph with the most optimal serendipity (approximated using centrality measures)."""
-        pairs = [(0.35, 5), (0.55, 4), (0.65, 2), (0.85, 0)] # (0.35, 7) is good for densely connected verses, but not good for sparse verses
+        return self._select_subgraph(id)[1]
+
+    def _select_subgraph(self, id):
+        """Select the subgraph with the most optimal serendipity. Returns ((factor, cutoff), subgraph)."""
+        pairs = SUBGRAPH_PAIRS
         centrality = {}
-        graphs = {}
         max_nodes = 0
 
         # Try a few subgraphs
-        for f, k in pairs:
-            G = self.get_related_subgraph_force_crossrefs(factor=f, id=id, how_many=k)
-            centrality[(f, k)] = self.get_centrality_measures(G)
-            graphs[(f, k)] = G
+        graphs = self._get_candidate_subgraphs(id, pairs)
+        measures = centrality_measures(list(graphs.values())) # score every subgraph at once
+        for ((f, k), G), measure in zip(graphs.items(), measures):
+            centrality[(f, k)] = measure
             max_nodes = len(G) if len(G) > max_nodes else max_nodes
             # print(f"centrality: {centrality[(f, k)]} length: {len(G)}")
             
@@ -489,7 +547,7 @@ class BibleNetwork:
         # print(f"top_graphs: {[top1, top2, top3]} mode: {top_graph}")
 
         print(f"selecting... factor: {top_graph[0]} cutoff: {top_graph[1]} options: {top1, top2, top3}")     
-        return graphs[top_graph]
+        return top_graph, graphs[top_graph]
 
     def previous_verse(self, id=""):
         id = self.get_id() if id == "" else id
@@ -513,7 +571,7 @@ class BibleNetwork:
         self.active = self.get_node(id)
     
     def get_random_node(self):
-        return choice(self.bible.nodes(data=True))
+        return self.get_node(randrange(len(self.verses)))
     
     def _weight_function(self, u, v, d):
         """An inverse function. Highest weights are now the lowest and vice versa."""
@@ -523,56 +581,43 @@ class BibleNetwork:
         """Gets clusters of verses that are "related" to one another. Verses that are weighted more will clustered.
         Returns list of nodes in cluster."""
         source = {self.get_id()} if id == "" else id
-        cutoff = 15 * factor # a larger factor means a larger graph
-        length, paths = nx.multi_source_dijkstra(self.bible, source, cutoff=cutoff, weight=self._weight_function)
-        nodes = list(paths.keys()) # list of nodes in cluster
-        
-        return nodes, length, paths
+        return self.crossrefs.cluster(source, self._get_cutoff(factor)) # (nodes, length, paths)
+
+    def _search_cluster(self, factor=1, id=""):
+        """Search for the clusters that _tune_cluster may need for the given factor (using a single dijkstra).
+        Returns a ClusterSearch."""
+        source = {self.get_id()} if id == "" else id
+        return self.crossrefs.search(source, self._get_search_cutoff(factor))
+
+    def _get_search_cutoff(self, factor):
+        """The largest cutoff that _tune_cluster can reach from the given factor (i.e. factor + 5 * 0.3 + 5 * 0.1)."""
+        return self._get_cutoff(factor + 2.0) + 1 # + 1 as float factors may overshoot
+
+    def _get_cutoff(self, factor):
+        """Convert a factor into the maximum distance of a cluster."""
+        return 15 * factor # a larger factor means a larger graph
     
-    def _get_crossrefs(self, id=""):
-        return self.bible[self.get_id()] if id == "" else self.bible[id]
-       
     def _init_verses(self):
-        """Add verses to graph."""
-        for path in self.nodes_path:
-            verses = self._read_verses(path)
-            # print(verses[0:3])
-            self.bible.add_nodes_from(verses)
+        """Open the verse store. Verse data is read lazily from the store."""
+        self.verses = open_verses(self.nodes_path, self.verses_path)
+        self.lookup = VerseLookup(self.verses) # e.g. Matt.3.3 <-> id
+        self.books = BookResolver(self.taxonomy_path) # e.g. 1 cor -> 1Cor
+        self.autocomplete = Autocomplete(self.books, self.verses) # e.g. Ecclesssia 4.11 -> Eccl.4.11
+        self.topics = open_topics(self.verses, self.topics_path) # e.g. kingdomofgod -> verses
+        self.fulltext = open_fulltext(self.verses, self.fulltext_path) # e.g. bread of life -> verses
 
         return
 
     def _init_crossrefs(self):
-        """Add cross-references to graph."""
-        crossrefs = self._read_crossrefs()
-        self.bible.add_edges_from(crossrefs)
+        """Open the cross-reference graph (i.e. the edges of the bible)."""
+        self.crossrefs = open_crossrefs(self.crossrefs_path, self.verses, self.crossrefs_bin_path)
         return
 
-    def _read_verses(self, path):
-        """Reads json and returns list of verses [ tuple1(id, dict<attrs>), tuple2(id, dict<attrs>), ... ]."""
-        # data = []
-        # for path in self.nodes_path:
-        #     with open(path, 'r') as config_file:
-        #         data_loaded = json.load(config_file)
-        #         data += data_loaded
-        #         # print(data[0:1])
-
-        with open(path, 'r') as config_file:
-            data_loaded = json.load(config_file)
-            data = data_loaded
-
-        return data_loaded
-    
-    def _read_crossrefs(self):
-        """Reads json and returns list of crossrefs [ tuple1(to, from, dict<attrs>), tuple2(to, from, dict<attrs>), ... ]."""
+    def _init_subgraphs(self):
+        """Open the precomputed subgraph index (if it has been built). Otherwise, subgraphs are computed on request."""
+        self.subgraph_index = open_subgraph_index(self.subgraphs_path, self.crossrefs, SUBGRAPH_PAIRS, SUBGRAPH_ALGORITHM)
+        return
 
-        data = []
-        for path in self.crossrefs_path:
-            with open(path, 'r') as config_file:
-                data_loaded = json.load(config_file)
-                data += data_loaded
-                    
-        return data
-    
     def test_attributes(self, node):
         # Initalise variables
         factors = [x/100 for x in range(5, 201, 10)]
@@ -589,9 +634,10 @@ class BibleNetwork:
                 nodes = len(subgraph)
                 if nodes > 26:
                     continue
-                degree = round_avg(nx.degree_centrality(subgraph).values(), nodes)
-                closeness = round_avg(nx.closeness_centrality(subgraph).values(), nodes)
-                betweeness = round_avg(nx.betweenness_centrality(subgraph).values(), nodes)
+                graph = subgraph.to_networkx()
+                degree = round_avg(nx.degree_centrality(graph).values(), nodes)
+                closeness = round_avg(nx.closeness_centrality(graph).values(), nodes)
+                betweeness = round_avg(nx.betweenness_centrality(graph).values(), nodes)
                 hash = factor * ( betweeness + closeness + degree + node ) * 100
 
                 serendipity = prev_serendipity if hash == prev_hash else round(network.get_serendipity(subgraph), 4)
@@ -608,6 +654,10 @@ class BibleNetwork:
         path = r'tests/serendipity-raw.csv'
         write(string, path)
 
+    def get_cache_stats(self):
+        """Returns the hits, misses and evictions of the subgraph cache."""
+        return self.cache.stats()
+
     def get_random_ids(self, k):
         count = 0 
         ids = []
@@ -619,6 +669,9 @@ class BibleNetwork:
         return ids
     
     def get_centrality_measures(self, G):
+        if isinstance(G, Subgraph) or G.is_directed():
+            return centrality_measures([G])[0]
+
         nodes = len(G)
         degree = round_avg(nx.degree_centrality(G).values(), nodes)
         closeness = round_avg(nx.closeness_centrality(G).values(), nodes)
@@ -681,6 +734,56 @@ class BibleNetwork:
             attrs += verse["english"]
         return Co_Occurence(strongs, nodes_attrs=attrs, label=self.get_name(id))
 
+    def get_cooccurence_matrix(self):
+        """Returns the co-occurence matrix of every verse (it is opened on first use)."""
+        if self.cooccurence_matrix is None:
+            self.cooccurence_matrix = open_cooccurence_matrix(self.verses, self.get_stopwords(), self.cooccurence_path)
+        return self.cooccurence_matrix
+
+    def get_passage_cooccurence(self, x, y):
+        """Get the co_occurence graph of the passage from the id x to the id y (from the co-occurence matrix)."""
+        start, end = (y, x) if x > y else (x, y)
+        return self.get_cooccurence_matrix().passage(start, end, label=self.get_passage_name(start, end))
+
+    def compare_passages(self, passages):
+        """Returns the similarity (0 to 1) of the co-occurence of every pair of passages, as a matrix.
+        passages: a list of passages (as returned by get_passage)."""
+        ranges = [(passage['ids'][0], passage['ids'][-1]) for passage in passages]
+        return self.get_cooccurence_matrix().similarity(ranges)
+
+    def get_cooccurence_windows(self, ids, k=5):
+        """Yield (id, co_occurence) for each of the given (consecutive) ids, where co_occurence is the graph of
+        the verse and the k verses either side. The window slides along, so each step only adds and removes a verse."""
+        window = Co_Occurence_Window()
+        start = end = None # the window holds the verses start to end - 1
+
+        for id in ids:
+            low, high = max(id - k, 0), min(id + k + 1, len(self.verses))
+
+            # Start again if the window does not overlap
+            if start is None or low >= end or high <= start:
+                window = Co_Occurence_Window()
+                start = end = low
+
+            # Slide the window
+            while end < high:
+                verse = self.get_strongs(end, no_stopwords=True)
+                window.append(verse["strongs"], verse["english"])
+                end += 1
+            while start > low:
+                start -= 1
+                verse = self.get_strongs(start, no_stopwords=True)
+                window.appendleft(verse["strongs"], verse["english"])
+            while start < low:
+                window.popleft()
+                start += 1
+            while end > high:
+                window.pop()
+                end -= 1
+
+            window.label = self.get_name(id)
+            yield id, window
+
 def write(data, path):
     """Write data_structure to given path"""
     with open(path, 'w', encoding='utf-8') as f:
@@ -732,21 +835,22 @@ if __name__ == "__main__":
               network.get_id_by_search("John 18:2"),]
 
     # Calculate co-occurence for verse using context (width = k)
-    for verse in search:
-        # Get context
-        passage = [i for i in range(verse - k, verse + k + 1)]
-
+    for verse, cooccurence in network.get_cooccurence_windows(search, k):
         # Get report
         print(f"=== {network.get_name(verse)} ===")
         print(f"{network.get_verse(verse)}")
-        cooccurence = network.get_cooccurence(passage)
         cooccurence.print_report(k=8, but_only=network.get_strongs(verse, no_stopwords=True)['strongs'])
         print("\n")
 
+    # Compare the co-occurence of the given passages (i.e. the feeding of the 5000)
+    similarity = network.compare_passages(passages)
+    for i, passage in enumerate(passages):
+        print(f"{passage['name']}: {[round(x, 3) for x in similarity[i].tolist()]}")
+
     # Calculate co-occurence for the given passages.
     # for passage in passages:
     #     print(f"=== {passage['name']} ===")
-    #     cooccurence = network.get_cooccurence(passage['ids'])
+    #     cooccurence = network.get_passage_cooccurence(passage['ids'][0], passage['ids'][-1])
     #     cooccurence.print_report(k=8)
     #     print("\n")
 
@@ -263,6 +263,11 @@ class DashController():
 
         return tabs
     
+    def get_theme_ids(self, theme, id, id2=None):
+        """Returns the ids of the nodes of the graph that have the theme."""
+        G = self.graph(id=id, id2=id2)
+        return self.network.get_ids_by_topic(theme, G.nodes)
+
     def get_dropdown(self, items, id=""):
         """Returns a dropdown of verses."""
         options = []
@@ -289,16 +294,27 @@ class DashController():
     def get_search(self, msg='', id="search", classes=""):
         msg = msg if msg else "type a verse... eg. Matthew 4:3"
         inputs = html.Div([  
-            db.get_input(id=id, type='text', placeholder=f"{msg}")
+            db.get_input(id=id, type='text', placeholder=f"{msg}", suggestions=f"{id}-suggestions"),
+            html.Datalist(id=f"{id}-suggestions", children=[]),
             ], className=f"{classes} fancy-search")
         
         return inputs
+
+    def get_suggestions(self, search):
+        """Returns the suggestions of a search as a list of options (for the search datalist)."""
+        return [html.Option(value=x['label']) for x in self.network.get_suggestions(search)]
     
     def get_id_by_search(self, search, current_id=""):
         """Returns the id that corresponds to the search."""
         id = self.network.get_id_by_search(search)
         id = current_id if id == "" else id
         return id
+
+    def get_id_by_text(self, search, current_id=""):
+        """Returns the id that corresponds to a submitted search (a reference, or otherwise the text of a verse)."""
+        id = self.network.get_id_by_text(search)
+        id = current_id if id == "" else id
+        return id
     
     def get_verses_dropdown(self):
         """Returns a book / chapter / verse dropdown."""
@@ -330,7 +346,7 @@ class DashController():
         children = []
         count = 1
         max = 5    
-        for crossref in self.network.get_crossrefs(source_id):
+        for crossref in self.network.get_crossrefs(source_id, how_many=max):
             # build crossreferences
             id = crossref[0]
             children.append(self.get_verse_as_div(id, get_name=True, get_url=True))
@@ -394,7 +410,7 @@ class DashController():
     def generate_edges(self, G):
         edges = [
             {'data': {'source': str(source), 'target': str(target), 'id': f"{source}-{target}"}}
-            for source, target, data in G.edges(data=True)
+            for source, target in G.edges
         ]
         return edges
     
@@ -406,18 +422,18 @@ class DashController():
          # build nodes
         nodes = [
             {
-                'data': {'id': str(id), 'label': data['name'], 'fullname': network.get_fullname(id), 'verse': data['content'], 'path': data['path'],
+                'data': {'id': str(id), 'label': network.get_name(id), 'fullname': network.get_fullname(id), 'verse': network.get_verse(id), 'path': list(G.paths[id]),
                         'active': 'active' if id in active_ids else 'inactive', 'theme': network.get_topics(id)
                         }, 
                 'selectable': True,
                 'fit': False,
-                # 'position': {'x': (data['position'][0]) * factor, 'y': (data['position'][1]) * factor},
+                # 'position': {'x': (G.positions[id][0]) * factor, 'y': (G.positions[id][1]) * factor},
 
             }
-            for id, data in ( G.nodes(data=True) )
+            for id in G.nodes
         ]
 
-        # print(f"A sample node... {G.nodes(data=True)}")
+        # print(f"A sample node... {G}")
         return nodes
     
     def get_prev_next(self, id):
@@ -0,0 +1,150 @@
+import re
+from bisect import bisect_left
+
+# Search cleanup (e.g. "1 Cor 3:16" -> ["1", "cor", "3", "16"])
+SPECIALS = re.compile(r'[^\w :.]')
+SEPARATORS = re.compile(r'[ :.]+')
+
+def trigrams(word):
+    """Returns the set of trigrams of a word, padded so the start of the word has more weight."""
+    word = f"$${word}$"
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+class Autocomplete:
+    """Suggests verse references as a user types, including prefixes (e.g. "eccl 4") and misspellings
+    (e.g. "Ecclesssia 4.11").
+
+    Books are found with a sorted list of spellings (for prefixes) and a trigram index (for misspellings).
+    Chapters and verses are checked against the bounds of each book, so every suggestion exists."""
+    def __init__(self, books, verses):
+        self.books = books
+        self.names = {items['short']: name for name, items in books.taxonomy.items()} # e.g. Gen -> Genesis
+        self.order = {items['short']: i for i, items in enumerate(books.taxonomy.values())}
+
+        # Every spelling of every book (without spaces)
+        self.spellings = {}
+        for name, items in books.taxonomy.items():
+            for spelling in items['spellings'] + [name, items['short']]:
+                self.spellings.setdefault(spelling.lower().replace(" ", ""), items['short'])
+        self.sorted_spellings = sorted(self.spellings)
+
+        # Trigram index
+        self.trigrams = {}
+        self.sizes = {}
+        for spelling in self.spellings:
+            grams = trigrams(spelling)
+            self.sizes[spelling] = len(grams)
+            for gram in grams:
+                self.trigrams.setdefault(gram, []).append(spelling)
+
+        # Bounds (i.e. the last verse of every chapter of every book)
+        self.bounds = {}
+        for id in range(len(verses)):
+            book, chap, verse = verses.get_name(id).rsplit('.', 2)
+            chapters = self.bounds.setdefault(book, {})
+            chapters[int(chap)] = max(chapters.get(int(chap), 0), int(verse))
+
+    def match_books(self, search, limit=5, min_score=0.25):
+        """Returns a list of (book, score) that best match the given spelling (e.g. "ecclesssia")."""
+        search = search.lower().replace(" ", "")
+        if search == "":
+            return []
+
+        scores = {}
+
+        # Exact spellings and prefixes
+        if search in self.spellings:
+            scores[self.spellings[search]] = 2.0
+        i = bisect_left(self.sorted_spellings, search)
+        while i < len(self.sorted_spellings) and self.sorted_spellings[i].startswith(search):
+            book = self.spellings[self.sorted_spellings[i]]
+            scores[book] = max(scores.get(book, 0), 1.0 + len(search) / len(self.sorted_spellings[i]))
+            i += 1
+
+        # Misspellings (the similarity of the trigrams)
+        grams = trigrams(search)
+        shared = {}
+        for gram in grams:
+            for spelling in self.trigrams.get(gram, []):
+                shared[spelling] = shared.get(spelling, 0) + 1
+
+        for spelling, count in shared.items():
+            score = count / (len(grams) + self.sizes[spelling] - count)
+            book = self.spellings[spelling]
+            if score >= min_score and score > scores.get(book, 0):
+                scores[book] = score
+
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], self.order[x[0]]))
+        return ranked[:limit]
+
+    def _split(self, search):
+        """Split a search into (book, chapter, verse). Chapter and verse are None if they are missing."""
+        search = SPECIALS.sub('', search).strip()
+        parts = [x for x in SEPARATORS.split(search) if x]
+
+        # Book (e.g. "1 cor" or "song of songs")
+        book = []
+        while parts and (not parts[0].isdigit() or (not book and len(parts) > 1 and not parts[1].isdigit())):
+            book.append(parts.pop(0))
+        numbers = [int(x) for x in parts[:2] if x.isdigit()]
+        numbers += [None] * (2 - len(numbers))
+
+        return " ".join(book), numbers[0], numbers[1]
+
+    def suggest(self, search, limit=5):
+        """Returns a ranked list of suggestions for the given search. Each suggestion is a dict of
+        its label (e.g. "Ecclesiastes 4:11"), reference (e.g. Eccl.4.11) and score."""
+        search = "" if search is None else search
+        book, chap, verse = self._split(search)
+        suggestions = []
+
+        for short, score in self.match_books(book, limit=limit):
+            chapters = self.bounds.get(short, {})
+            if not chapters:
+                continue
+
+            if chap is None:
+                chap_verse = [(min(chapters), 1)]
+            elif chap not in chapters:
+                continue
+            elif verse is None:
+                chap_verse = [(chap, 1)]
+            elif verse <= chapters[chap]:
+                chap_verse = [(chap, verse)]
+            else:
+                continue
+
+            for ch, vs in chap_verse:
+                suggestions.append({
+                    "label": f"{self.names[short]} {ch}:{vs}",
+                    "reference": f"{short}.{ch}.{vs}",
+                    "score": round(score, 4),
+                })
+
+        return suggestions[:limit]
+
+    def correct(self, search):
+        """Returns the reference that best matches a (misspelled) search, or "" if it does not have
+        a chapter and verse that exist."""
+        book, chap, verse = self._split("" if search is None else search)
+        if chap is None or verse is None:
+            return ""
+
+        suggestions = self.suggest(search, limit=1)
+        return suggestions[0]["reference"] if suggestions else ""
+
+if __name__ == "__main__":
+    from books import BookResolver
+    from verse_store import VerseStore
+    import time
+
+    autocomplete = Autocomplete(BookResolver(r"bible.json"), VerseStore(r"verses.bin"))
+    searches = ["afhasdsadas", "^3k&dx", 'Matthew 1.4', 'Genesis 2:6', 'gen 15:15', 'Genesis 23:10', 'Ecclesssia 4.11', '&&&Matthew 21:10', 'Matt 04:3', "1 co", "ec"]
+    for search in searches:
+        print(f"search: {search} suggestions: {[x['label'] for x in autocomplete.suggest(search)]} correct: {autocomplete.correct(search)}")
+
+    # Time suggestions
+    start = time.perf_counter()
+    for i in range(1000):
+        autocomplete.suggest(searches[i % len(searches)])
+    print(f"{(time.perf_counter() - start):.4f}ms per suggestion")
@@ -0,0 +1,86 @@
+import json
+import re
+
+# Search cleanup (see BookResolver.parse)
+SPECIALS = re.compile(r'[^(\.\w :)]')
+SPACES = re.compile(r'[ ]+')
+
+class BookResolver:
+    """Resolves the spelling of a book (e.g. "mt", "Matthew" or "1 cor") to its short name (e.g. Matt).
+
+    The index is built once from bible.json. It contains every spelling, name and short name of a book,
+    the same without spaces (e.g. "1cor") and every prefix that only belongs to one book (e.g. "gene")."""
+    def __init__(self, path=r"bible.json"):
+        self.path = path
+        with open(path, 'r') as config_file:
+            self.taxonomy = json.load(config_file)
+        self.index = self._build_index(self.taxonomy)
+
+    def _build_index(self, taxonomy):
+        index = {}
+        prefixes = {}
+
+        for book, items in taxonomy.items():
+            spellings = [x.lower() for x in items['spellings'] + [book, items['short']]]
+            spellings += [x.replace(" ", "") for x in spellings]
+
+            for spelling in spellings:
+                # Spellings in bible.json take priority (the first book wins, as in a linear search)
+                index.setdefault(spelling, items['short'])
+
+                # Prefixes (e.g. "ge", "gen", "gene" and "genes")
+                for i in range(2, len(spelling)):
+                    prefixes.setdefault(spelling[:i], set()).add(items['short'])
+
+        # Only keep prefixes that are not ambiguous (e.g. "jo" could be John, Job, Jonah or Joshua)
+        for prefix, books in prefixes.items():
+            if len(books) == 1 and prefix not in index:
+                index[prefix] = books.pop()
+
+        return index
+
+    def __len__(self):
+        return len(self.index)
+
+    def resolve(self, search):
+        """Returns the short name of the book (or "" if there is no such book)."""
+        return self.index.get(search.strip().lower(), "")
+
+    def resolve_many(self, searches):
+        """Returns the short name of each book (or "" if there is no such book)."""
+        index = self.index
+        return [index.get(search.strip().lower(), "") for search in searches]
+
+    def parse(self, search):
+        """Parse a search (e.g. "1 Cor 3:16") into a reference (e.g. 1Cor.3.16). Returns "" if it is invalid."""
+        search = search.strip()
+        search = SPECIALS.sub('', search) # delete specials
+        search = SPACES.sub(' ', search) # remove double spaces
+        search = search.replace(':', '.').replace(' ', '.')
+        search = search.split('.', 3)
+
+        if len(search) < 3:
+            return ""
+
+        if search[0] in ['1', '2', '3']:
+            if len(search) < 4:
+                return ""
+            num, bk, ch, vs = search[:4]
+            bk = f"{num} {bk}"
+        else:
+            bk, ch, vs = search[:3]
+
+        bk = self.resolve(bk)
+        if bk == "":
+            return ""
+
+        return f"{bk}.{ch}.{vs}"
+
+    def parse_many(self, searches):
+        """Parse a list of searches into references (see parse)."""
+        return [self.parse(search) for search in searches]
+
+if __name__ == "__main__":
+    books = BookResolver(r"bible.json")
+    print(f"{len(books)} spellings. mt: {books.resolve('mt')}, 1 cor: {books.resolve('1 cor')}")
+    print(books.parse_many(["Genesis 1:1", "1 Corinthians 13 4", "matt.5.3", "nothing 1 1"]))
@@ -0,0 +1,97 @@
+import sys
+import threading
+from collections import OrderedDict
+import networkx as nx
+from subgraph import Subgraph
+
+def estimate_size(value):
+    """Estimate the memory (in bytes) used by a value, including the values it contains."""
+    if isinstance(value, Subgraph):
+        return sys.getsizeof(value) + estimate_size(value.__reduce__()[1])
+    if isinstance(value, nx.Graph):
+        nodes = list(value.nodes(data=True))
+        edges = list(value.edges(data=True))
+        return sys.getsizeof(value) + estimate_size(nodes) + estimate_size(edges)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(x) for x in value)
+
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """A thread-safe, least-recently-used cache. Bounded by the number of items and their (estimated) memory.
+
+    Keeps count of hits, misses and evictions."""
+    def __init__(self, max_items=1024, max_bytes=64 * 1024 * 1024, sizeof=estimate_size):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.items = OrderedDict() # key: (value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        """Returns the cached value of key (or default if it is not cached)."""
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key][0]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Cache value, evicting the least recently used items if the cache is full."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return # too big to cache
+
+        with self.lock:
+            if key in self.items:
+                self.bytes -= self.items.pop(key)[1]
+            self.items[key] = (value, size)
+            self.bytes += size
+
+            # Evict least recently used
+            while len(self.items) > self.max_items or self.bytes > self.max_bytes:
+                x, (old, old_size) = self.items.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value of key. If it is not cached, compute() it and cache it."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Returns the hits, misses, evictions and size of the cache."""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "items": len(self.items),
+                "bytes": self.bytes,
+            }
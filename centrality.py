@@ -0,0 +1,139 @@
+import numpy as np
+
+# Centrality measures of small, unweighted, directed graphs (e.g. the subgraphs of BibleNetwork).
+#
+# Graphs are dense adjacency matrices, padded to the same size, so several graphs are scored at once.
+# The results are the same as nx.degree_centrality, nx.closeness_centrality and nx.betweenness_centrality.
+
+def to_adjacency(G):
+    """Returns the adjacency matrix of a Subgraph or nx.DiGraph (nodes are in the order of G.nodes)."""
+    index = {node: i for i, node in enumerate(G.nodes)}
+    A = np.zeros((len(index), len(index)), dtype=np.float64)
+    for u, v in G.edges:
+        A[index[u], index[v]] = 1
+    return A
+
+def _pad(matrices):
+    """Stack adjacency matrices into one array of shape (graphs, n, n). Padded nodes have no edges."""
+    n = max(len(A) for A in matrices)
+    batch = np.zeros((len(matrices), n, n), dtype=np.float64)
+    for i, A in enumerate(matrices):
+        batch[i, :len(A), :len(A)] = A
+    return batch
+
+def _shortest_paths(A):
+    """Breadth-first search from every node of every graph at once.
+
+    Returns (D, sigma) where D[g, s, v] is the distance from s to v (inf if unreachable)
+    and sigma[g, s, v] is the number of shortest paths from s to v."""
+    graphs, n, x = A.shape
+    D = np.full(A.shape, np.inf)
+    sigma = np.zeros(A.shape)
+    frontier = np.broadcast_to(np.eye(n), A.shape).copy()
+    D[frontier > 0] = 0
+    sigma[frontier > 0] = 1
+
+    # Search one level at a time
+    for d in range(1, n):
+        paths = (sigma * frontier) @ A
+        frontier = (paths > 0) & np.isinf(D)
+        if not frontier.any():
+            break
+        D[frontier] = d
+        sigma[frontier] = paths[frontier]
+        frontier = frontier.astype(np.float64)
+
+    return D, sigma
+
+def _betweenness(A, D, sigma):
+    """Brandes' algorithm, accumulating the dependencies of every source at once (one level at a time)."""
+    delta = np.zeros(A.shape)
+    levels = D[np.isfinite(D)].max() if np.isfinite(D).any() else 0
+    At = np.swapaxes(A, 1, 2)
+
+    for d in range(int(levels), 0, -1):
+        level = D == d
+        coeff = np.where(level, (1 + delta) / np.where(level, sigma, 1), 0)
+        delta += np.where(D == d - 1, sigma * (coeff @ At), 0)
+
+    # A node does not depend on itself
+    n = A.shape[1]
+    delta[:, np.arange(n), np.arange(n)] = 0
+    return delta.sum(axis=1)
+
+def centrality_measures(graphs):
+    """Returns the average degree, closeness and betweenness centrality of each graph (rounded to 4 places).
+
+    Returns a list of {'degree', 'closeness', 'betweens'} (one per graph)."""
+    if not graphs:
+        return []
+
+    matrices = [to_adjacency(G) for G in graphs]
+    A = _pad(matrices)
+    D, sigma = _shortest_paths(A)
+    betweenness = _betweenness(A, D, sigma)
+    results = []
+
+    for i, matrix in enumerate(matrices):
+        n = len(matrix)
+        d = D[i, :n, :n]
+
+        # Degree (in + out)
+        if n <= 1:
+            degree = np.ones(n)
+        else:
+            degree = (matrix.sum(axis=0) + matrix.sum(axis=1)) * (1.0 / (n - 1.0))
+
+        # Closeness (using incoming distances)
+        reachable = np.isfinite(d).sum(axis=0)
+        total = np.where(np.isfinite(d), d, 0).sum(axis=0)
+        closeness = np.zeros(n)
+        valid = (total > 0) & (n > 1)
+        closeness[valid] = (reachable[valid] - 1.0) / total[valid]
+        if n > 1:
+            closeness[valid] *= (reachable[valid] - 1.0) / (n - 1)
+
+        # Betweenness (normalised)
+        betweens = betweenness[i, :n]
+        if n > 2:
+            betweens = betweens * (1 / ((n - 1) * (n - 2)))
+
+        results.append({
+            'degree': round_avg(degree, n),
+            'closeness': round_avg(closeness, n),
+            'betweens': round_avg(betweens, n),
+        })
+
+    return results
+
+def round_avg(x, nodes):
+    return round(sum(x.tolist()) / nodes, 4)
+
+if __name__ == "__main__":
+    # Validate against networkx
+    import random
+    import networkx as nx
+    from subgraph import Subgraph
+
+    random.seed(1)
+    graphs = []
+    for x in range(200):
+        n = random.randint(1, 26)
+        edges = [(u, v) for u in range(n) for v in range(n) if u != v and random.random() < 0.15]
+        graphs.append(Subgraph(range(n), edges, {i: [i] for i in range(n)}, {i: 0 for i in range(n)}))
+
+    failures = 0
+    for G, measures in zip(graphs, centrality_measures(graphs)):
+        H = G.to_networkx()
+        n = len(H)
+        expected = {
+            'degree': round(sum(nx.degree_centrality(H).values()) / n, 4),
+            'closeness': round(sum(nx.closeness_centrality(H).values()) / n, 4),
+            'betweens': round(sum(nx.betweenness_centrality(H).values()) / n, 4),
+        }
+        for key in expected:
+            if abs(expected[key] - measures[key]) > 1e-4:
+                failures += 1
+                print(f"{key} differs for {G}: {measures[key]} != {expected[key]}")
+
+    print(f"Validated {len(graphs)} graphs against networkx. Failures: {failures}")
@@ -0,0 +1,142 @@
+import numpy as np
+from packed import write_packed, read_packed, is_stale, pack_strings, Strings
+
+VERSION = 1
+
+class Concordance:
+    """An index of every verse that uses a strongs number (e.g. G26), with the number of times it is used.
+
+    The verses of strongs number s are post_verse[sn_ptr[s]:sn_ptr[s+1]] (sorted). Lemmas and
+    transliterations are looked up through the strongs dictionary."""
+    def __init__(self, verses, strongs_dict=None, path=r"concordance.bin"):
+        self.path = path
+        self.verses = verses
+        self.data, meta = read_packed(path)
+        self.sns = {sn: i for i, sn in enumerate(Strings(self.data["sn"], self.data["sn_offsets"]))}
+
+        # Lemma and transliteration -> strongs numbers
+        self.lemmas = {}
+        self.translits = {}
+        dictionary = {} if strongs_dict is None else strongs_dict.get_dict()
+        for sn, entry in dictionary.items():
+            if sn in self.sns:
+                self.lemmas.setdefault(entry.get('lemma'), []).append(sn)
+                self.translits.setdefault(entry.get('translit', '').lower(), []).append(sn)
+
+    def __len__(self):
+        return len(self.sns)
+
+    def __contains__(self, sn):
+        return sn in self.sns
+
+    def _postings(self, sn):
+        if sn not in self.sns:
+            return slice(0, 0)
+        i = self.sns[sn]
+        return slice(self.data["sn_ptr"][i], self.data["sn_ptr"][i + 1])
+
+    def get_verses(self, sn):
+        """Returns the (sorted) ids of every verse that uses the strongs number."""
+        return self.data["post_verse"][self._postings(sn)]
+
+    def get_counts(self, sn):
+        """Returns a dict of verse id: the number of times the strongs number is used in that verse."""
+        postings = self._postings(sn)
+        return dict(zip(self.data["post_verse"][postings].tolist(), self.data["post_count"][postings].tolist()))
+
+    def frequency(self, sn):
+        """Returns the number of times the strongs number is used in the bible."""
+        return int(self.data["post_count"][self._postings(sn)].sum())
+
+    def verse_frequency(self, sn):
+        """Returns the number of verses that use the strongs number."""
+        postings = self._postings(sn)
+        return postings.stop - postings.start
+
+    def most_frequent(self, k=10):
+        """Returns the k most used strongs numbers as a list of (sn, frequency)."""
+        totals = np.add.reduceat(self.data["post_count"], self.data["sn_ptr"][:-1]) if len(self) else np.empty(0)
+        top = np.argsort(-totals, kind="stable")[:k]
+        names = list(self.sns)
+        return [(names[i], int(totals[i])) for i in top]
+
+    def intersection(self, sns):
+        """Returns the ids of the verses that use every one of the strongs numbers."""
+        sns = list(sns)
+        if not sns:
+            return np.empty(0, dtype=np.int32)
+        postings = sorted((self.get_verses(sn) for sn in sns), key=len) # smallest first
+        ids = postings[0]
+        for verses in postings[1:]:
+            ids = np.intersect1d(ids, verses, assume_unique=True)
+        return ids
+
+    def union(self, sns):
+        """Returns the ids of the verses that use any of the strongs numbers."""
+        postings = [self.get_verses(sn) for sn in sns]
+        return np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int32)
+
+    def get_sns_by_lemma(self, lemma):
+        return self.lemmas.get(lemma, [])
+
+    def get_sns_by_translit(self, translit):
+        return self.translits.get(translit.lower(), [])
+
+    def get_verses_by_lemma(self, lemma):
+        """Returns the ids of the verses that use the lemma (e.g. ἀγάπη)."""
+        return self.union(self.get_sns_by_lemma(lemma))
+
+    def get_verses_by_translit(self, translit):
+        """Returns the ids of the verses that use the transliteration (e.g. agápē)."""
+        return self.union(self.get_sns_by_translit(translit))
+
+def compile_concordance(verses, path):
+    """Build the concordance from the strongs numbers of the verse store."""
+    word_ptr = verses.data["word_ptr"]
+    word_sn = np.asarray(verses.data["word_sn"])
+    word_verse = np.repeat(np.arange(len(verses), dtype=np.int32), np.diff(word_ptr))
+
+    # Sort words by strongs number, then verse
+    known = word_sn != -1
+    word_sn, word_verse = word_sn[known], word_verse[known]
+    order = np.lexsort((word_verse, word_sn))
+    word_sn, word_verse = word_sn[order], word_verse[order]
+
+    # Count each (strongs number, verse)
+    new = np.ones(len(word_sn), dtype=bool)
+    new[1:] = (word_sn[1:] != word_sn[:-1]) | (word_verse[1:] != word_verse[:-1])
+    starts = np.flatnonzero(new)
+    post_sn = word_sn[starts]
+    post_verse = word_verse[starts]
+    post_count = np.diff(np.append(starts, len(word_sn))).astype(np.int32)
+
+    # Group postings by strongs number
+    sn_ids, sn_starts = np.unique(post_sn, return_index=True)
+    sn_ptr = np.append(sn_starts, len(post_sn)).astype(np.int64)
+    sns = [verses.strings[i] for i in sn_ids.tolist()]
+
+    arrays = {"sn_ptr": sn_ptr, "post_verse": post_verse, "post_count": post_count}
+    arrays["sn"], arrays["sn_offsets"] = pack_strings(sns)
+    write_packed(path, arrays, meta={"version": VERSION})
+
+def open_concordance(verses, strongs_dict=None, path=r"concordance.bin"):
+    """Open the concordance, (re)building it first if it is missing or out of date."""
+    if is_stale(path, [verses.path], VERSION):
+        print("Building concordance...")
+        compile_concordance(verses, path)
+
+    return Concordance(verses, strongs_dict, path)
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    from strongs import get_strongs_dict
+    concordance_path = r"concordance.bin"
+
+    # Build the concordance (requires verses.bin)
+    verses = VerseStore(r"verses.bin")
+    compile_concordance(verses, concordance_path)
+    concordance = Concordance(verses, get_strongs_dict(), concordance_path)
+
+    print(f"{len(concordance)} strongs numbers. Most frequent: {concordance.most_frequent(5)}")
+    print(f"G26 is used {concordance.frequency('G26')} times in {concordance.verse_frequency('G26')} verses")
+    print(f"Verses with G26 and G2316: {concordance.intersection(['G26', 'G2316']).tolist()[:10]}")
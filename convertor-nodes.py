@@ -1,7 +1,7 @@
 import csv
 import json
 import traceback
-from strongs import StrongsDict
+from strongs import get_strongs_dict
 
 # Convert verses.csv into a readable data structure
 # list<tuples> where a tuple is (id, dict<name, book, chap, verse>)
@@ -17,7 +17,7 @@ def read_json(path):
         
         return data_loaded
 
-STRONGS_DICT = StrongsDict()
+STRONGS_DICT = get_strongs_dict()
 NOT_WORDS = ["...", "", "vvv", "-", " ", ".", "..", "...."]
 TOPIC_DICT = get_topic_dict()
     
@@ -1,5 +1,7 @@
 import networkx as nx
-from strongs import StrongsDict
+import heapq
+from collections import deque
+from strongs import SYNONYMS, get_strongs_dict
 class Co_Occurence:
     """A graph that stores and manipulates co-occurence data.
     
@@ -8,6 +10,8 @@ class Co_Occurence:
     """
     def __init__(self, nodes_list, nodes_attrs=[], edges_list=[], label="verses"):
         self.graph = nx.Graph()
+        self.mutations = 0 # the number of changes to the graph (centrality measures are cached until it changes)
+        self.centrality = None # (mutations, scores, sorted measures)
         
         # Replace synonyms
         nodes_list = self.replace_synonyms(nodes_list)
@@ -30,7 +34,7 @@ class Co_Occurence:
     def replace_synonyms(self, nodes_list):
         """Returns the nodes_list, with any synonyms replaced with a primary word."""
         x = []
-        synonyms = StrongsDict().get_synonyms()
+        synonyms = SYNONYMS
 
         # Build a new list of nodes with synoynms replaced
         for node in nodes_list:
@@ -54,6 +58,10 @@ class Co_Occurence:
 
     def get(self):
         return self.graph
+
+    def get_ordered(self):
+        """Returns the graph, with nodes and edges in the order they first appear (ties in centrality keep this order)."""
+        return self.graph
     
     def get_node_label(self, strongs):
         try: 
@@ -67,6 +75,8 @@ class Co_Occurence:
     def add_edge(self, a, b, weight=1):
         """Add edge, if does not exist. Combine weights on repeat edges."""
 
+        self.mutations += 1
+
         # Combine weight on repeat edge
         if self.graph.has_edge(a,b):
             self.graph[a][b]['weight'] += weight
@@ -95,6 +105,23 @@ class Co_Occurence:
     def rich_str(self):
         return f"{str(self)}\n--- nodes: {self.get().nodes}\n--- edges: {self.get().edges(data=True)}"
     
+    def _get_centrality(self):
+        """Returns (scores, measures) of the graph, computing them only if the graph has changed since
+        they were last computed. Scores are lists of (word, score) in node order, measures are sorted by score."""
+        if self.centrality is None or self.centrality[0] != self.mutations:
+            key = lambda x:x[1]
+            graph = self.get_ordered()
+            scores = {
+                "degree": list(self.get_degree(nx.degree_centrality(graph)).items()),
+                "betweens": list(nx.betweenness_centrality(graph, weight="weight").items()),
+                "closeness": list(nx.closeness_centrality(graph, distance="weight").items()),
+                "eigen": list(nx.eigenvector_centrality(graph, max_iter=300).items()),
+            }
+            measures = {measure: sorted(words, key=key, reverse=True) for measure, words in scores.items()}
+            self.centrality = (self.mutations, scores, measures)
+
+        return self.centrality[1], self.centrality[2]
+
     def get_centrality_measures(self):
         """Compute and return centrality measures.
         
@@ -106,25 +133,14 @@ class Co_Occurence:
         frequency - Number of times word is in teh passage
         
         """
-        key = lambda x:x[1]
-        # sorted(footballers_goals.items(), key=key)
-        betweens = sorted(nx.betweenness_centrality(self.get(), weight="weight").items(), key=key, reverse=True)
-        degree = sorted(self.get_degree(nx.degree_centrality(self.get())).items(), key=key, reverse=True)
-        eigen = sorted(nx.eigenvector_centrality(self.get(), max_iter=300).items(), key=key, reverse=True)
-        closeness = sorted(nx.closeness_centrality(self.get(), distance="weight").items(), key=key, reverse=True)
-        
-        return {
-            "degree": degree,
-            "betweens": betweens,
-            "closeness": closeness,
-            "eigen": eigen
-        }
+        scores, measures = self._get_centrality()
+        return {measure: list(words) for measure, words in measures.items()}
     
-    def get_centrality_measures_but_only(self, ids):
+    def get_centrality_measures_but_only(self, ids, measures=None):
         """Returns centrality measures, but only of the given words.
         ids: a list of ids to keep"""
 
-        measures = self.get_centrality_measures()
+        measures = measures if measures else self.get_centrality_measures()
         ids = self.replace_synonyms(ids)
         new_measures = {}
 
@@ -146,8 +162,9 @@ class Co_Occurence:
         unnormalised_degrees = {key: value * max_degree for key, value in measures.items()}
         return unnormalised_degrees
 
-    def _prepare_report(self, measures, strongs_dict=StrongsDict()):
+    def _prepare_report(self, measures, strongs_dict=None):
         """Return a centrality report (replacing "strongs numbers" with actual words)"""
+        strongs_dict = get_strongs_dict() if strongs_dict is None else strongs_dict
         centrality = measures
         report = {}
 
@@ -165,39 +182,46 @@ class Co_Occurence:
 
         return report
     
-    def centrality_report(self, strongs_dict=StrongsDict()):
+    def centrality_report(self, strongs_dict=None):
         """Returns centrality measures in the form of a dict report. 
         i.e. with keys: "strongs", "translit", "english", "score"
         """
         measures = self.get_centrality_measures()
         return self._prepare_report(measures, strongs_dict)
 
-    def get_important_words_report(self, k=5, get_least=False, strongs_dict=StrongsDict()):
+    def get_important_words_report(self, k=5, get_least=False, strongs_dict=None):
         """Returns the top k important words in the form of a dict report. 
         i.e. with keys: "strongs", "translit", "english", "score"
         """
-        important_words = self.get_important_words(self.get_centrality_measures(), k, get_least)
+        important_words = self.get_important_words(k=k, get_least=get_least)
         return self._prepare_report(important_words, strongs_dict)
     
-    def get_only_these_words_report(self, ids, k=5, get_least=False, strongs_dict=StrongsDict()):
+    def get_only_these_words_report(self, ids, k=5, get_least=False, strongs_dict=None):
         """Returns the top k important words in the form of a dict report. 
         i.e. with keys: "strongs", "translit", "english", "score"
         """
-        x = self.get_centrality_measures_but_only(ids)
+        scores, measures = self._get_centrality()
+        x = self.get_centrality_measures_but_only(ids, scores)
         important_words = self.get_important_words(x, k, get_least)
         return self._prepare_report(important_words, strongs_dict)
     
     def get_important_words(self, measures=None, k=5, get_least=False):
         """Returns the top k important words for each centrality measure.
          
+          measures: lists of (word, score), which do not need to be sorted.
           get_least: Gets the least k important words instead."""
         
-        measures = measures if measures else self.get_centrality_measures()
+        measures = measures if measures else self._get_centrality()[0]
+        key = lambda x:x[1]
+        important_words = {}
 
-        if get_least:
-            important_words = {key: value[::-1][:k]  for key, value in measures.items()}
-        else :
-            important_words = {key: value[:k]  for key, value in measures.items()}
+        # Select the top k (ties are in the same order as a sorted list)
+        for measure, words in measures.items():
+            n = max(len(words) + k, 0) if k < 0 else k
+            if get_least:
+                important_words[measure] = heapq.nsmallest(n, reversed(words), key=key)
+            else:
+                important_words[measure] = heapq.nlargest(n, words, key=key)
         return important_words
     
     def print_report(self, k=-1, get_least=False, but_only=[]):
@@ -234,6 +258,129 @@ class Co_Occurence:
     def __str__(self):
         return str(self.get()).replace("Graph", f"CoOccurence of {self.label}")
 
+class Co_Occurence_Window(Co_Occurence):
+    """A co-occurence graph of a sliding window of verses (e.g. a verse and the k verses either side).
+
+    Verses are added and removed at either end of the window, and only the edges of the words of that
+    verse change. The graph is the same as a Co_Occurence of the words of every verse in the window
+    (i.e. including an edge between the last word of a verse and the first word of the next)."""
+    def __init__(self, label="window"):
+        super().__init__([], label=label)
+        self.verses = deque() # the words of every verse in the window
+        self.words = deque() # the words of every verse in the window that has words
+        self.occurences = {} # word: the label of every time it is in the window (in order)
+
+    def __len__(self):
+        return len(self.verses)
+
+    def remove_edge(self, a, b, weight=1):
+        """Reduce the weight of an edge. Remove the edge once it has no weight."""
+        self.mutations += 1
+        self.graph[a][b]['weight'] -= weight
+        if self.graph[a][b]['weight'] <= 0:
+            self.graph.remove_edge(a, b)
+
+    def get_ordered(self):
+        """Returns a copy of the graph, with nodes and edges in the order they first appear in the window (as in a
+        Co_Occurence of the same verses). The window itself adds words to the end of the graph, wherever they are."""
+        graph = nx.Graph()
+        graph.add_nodes_from((word, self.graph.nodes[word]) for verse in self.words for word in verse)
+
+        prev = None
+        for verse in self.words:
+            for word in verse:
+                if prev is not None and not graph.has_edge(word, prev):
+                    graph.add_edge(word, prev, weight=self.graph[word][prev]['weight'])
+                prev = word
+
+        return graph
+
+    def _set_label(self, word):
+        """Label a word with its last label in the window (as does Co_Occurence)."""
+        label = self.occurences[word][-1]
+        if label is not None:
+            self.graph.nodes[word]['label'] = label
+
+    def _add_words(self, words, attrs, left):
+        """Add the nodes and (adjacent) edges of the words of a verse."""
+        self.mutations += 1
+        labels = attrs if attrs else [None] * len(words)
+        occurences = zip(reversed(words), reversed(labels)) if left else zip(words, labels)
+        for word, label in occurences:
+            if word not in self.occurences:
+                self.occurences[word] = deque()
+                self.graph.add_node(word)
+            self.occurences[word].appendleft(label) if left else self.occurences[word].append(label)
+            self._set_label(word)
+
+        for a, b in zip(words, words[1:]):
+            self.add_edge(b, a)
+
+    def _remove_words(self, words, left):
+        """Remove the (adjacent) edges and nodes of the words of a verse."""
+        self.mutations += 1
+        for a, b in zip(words, words[1:]):
+            self.remove_edge(b, a)
+
+        for word in words:
+            self.occurences[word].popleft() if left else self.occurences[word].pop()
+            if self.occurences[word]:
+                self._set_label(word)
+            else:
+                del self.occurences[word]
+                self.graph.remove_node(word)
+
+    def append(self, strongs, attrs=[]):
+        """Add a verse (i.e. its strongs numbers, and optionally their labels) to the end of the window."""
+        words = self.replace_synonyms(strongs)
+        self.verses.append(words)
+        if not words:
+            return
+
+        # Add the verse, and join it to the last verse
+        self._add_words(words, attrs, left=False)
+        if self.words:
+            self.add_edge(words[0], self.words[-1][-1])
+        self.words.append(words)
+
+    def appendleft(self, strongs, attrs=[]):
+        """Add a verse (i.e. its strongs numbers, and optionally their labels) to the start of the window."""
+        words = self.replace_synonyms(strongs)
+        self.verses.appendleft(words)
+        if not words:
+            return
+
+        # Add the verse, and join it to the first verse
+        self._add_words(words, attrs, left=True)
+        if self.words:
+            self.add_edge(self.words[0][0], words[-1])
+        self.words.appendleft(words)
+
+    def pop(self):
+        """Remove the verse at the end of the window. Returns its (synonym replaced) strongs numbers."""
+        words = self.verses.pop()
+        if words:
+            self.words.pop()
+            if self.words:
+                self.remove_edge(words[0], self.words[-1][-1])
+            self._remove_words(words, left=False)
+        return words
+
+    def popleft(self):
+        """Remove the verse at the start of the window. Returns its (synonym replaced) strongs numbers."""
+        words = self.verses.popleft()
+        if words:
+            self.words.popleft()
+            if self.words:
+                self.remove_edge(self.words[0][0], words[-1])
+            self._remove_words(words, left=True)
+        return words
+
+    def slide(self, strongs, attrs=[]):
+        """Move the window along by one verse, i.e. add a verse to the end and remove the first verse."""
+        self.append(strongs, attrs)
+        return self.popleft()
+
 if __name__ == "__main__":
     strongs = ["G4000", "G434", "G121", "G434", "G4944"]
     strongs2 = ["G4000", "G434", "G4000", "G434", "G121", "G121"]
@@ -250,6 +397,17 @@ if __name__ == "__main__":
     print(graph2.get_important_words(k=2, get_least=True))
     print(graph2.get_important_words_report(k=2, get_least=True))
     graph.print_report(k=5)
+
+    # Slide a window of 3 verses over the verses, checking it against a new graph of the same words
+    verses = [strongs, ["G121"], [], strongs2, ["G4944", "G4000"]]
+    window = Co_Occurence_Window()
+    for i, verse in enumerate(verses):
+        window.append(verse)
+        if len(window) > 3:
+            window.popleft()
+        expected = Co_Occurence(sum(verses[max(i - 2, 0):i + 1], []))
+        same = nx.utils.graphs_equal(window.get(), expected.get())
+        print(f"window {max(i - 2, 0)}-{i}: {window} (same as Co_Occurence: {same})")
     # graph.print()
     # graph2.print()
     # graph3 = graph.merge(graph2)
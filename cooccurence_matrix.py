@@ -0,0 +1,187 @@
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from packed import write_packed, read_packed, is_stale, pack_strings, Strings
+from cooccurence import Co_Occurence
+from strongs import SYNONYMS
+
+VERSION = 2 # (also change if SYNONYMS changes)
+
+class CooccurenceMatrix:
+    """The co-occurence counts of every verse, as a sparse verse x pair matrix.
+
+    The words of the bible (strongs numbers without stop words, with synonyms replaced) are interned to ids, and
+    every pair of adjacent words (a, b) with a <= b is a pair id. Row v counts the pairs that end in verse v,
+    including the pair that joins the last word of the previous verse (with words) to the first word of v. So the
+    co-occurence of the verses start to end is the sum of their rows, less the pair that joins start to the verse
+    before it. The words of verse v are word[word_ptr[v]:word_ptr[v+1]]."""
+    def __init__(self, path=r"cooccurence.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+        self.words = list(Strings(self.data["sn"], self.data["sn_offsets"]))
+        self.labels = Strings(self.data["label"], self.data["label_offsets"])
+        self.ids = {word: i for i, word in enumerate(self.words)}
+        self.stopwords = meta.get("stopwords") # where the stop words came from (stopwords.bin or the verses)
+
+        # Verse x pair matrix
+        verse_ptr = self.data["verse_ptr"]
+        shape = (len(verse_ptr) - 1, len(self.data["pair_a"]))
+        self.matrix = csr_matrix((self.data["count"], self.data["pair"], verse_ptr), shape=shape)
+
+    def __len__(self):
+        return len(self.words)
+
+    def get_pair(self, pair):
+        """Returns the (a, b) strongs numbers of a pair id."""
+        return self.words[self.data["pair_a"][pair]], self.words[self.data["pair_b"][pair]]
+
+    def _words(self, start, end):
+        """Returns the range of the words of the verses from start to end (inclusive)."""
+        word_ptr = self.data["word_ptr"]
+        return word_ptr[start], word_ptr[end + 1]
+
+    def counts(self, start, end):
+        """Returns the pair counts of the verses from start to end (inclusive) as a 1 x pairs sparse row."""
+        counts = csr_matrix(self.matrix[start:end + 1].sum(axis=0))
+
+        # Remove the pair that joins the passage to the verse before it
+        first, last = self._words(start, end)
+        if first < last and first > 0:
+            joins = self.data["join"][first]
+            counts[0, joins] -= 1
+            counts.eliminate_zeros()
+        return counts
+
+    def get_edges(self, start, end):
+        """Returns the edges of the verses from start to end (inclusive) as a list of (a, b, {"weight": count}),
+        in the order they first appear."""
+        first, last = self._words(start, end)
+        joins = self.data["join"][first + 1:last] # the pair of each word and the word before it
+        pairs, index, counts = np.unique(joins, return_index=True, return_counts=True)
+        order = np.argsort(index)
+
+        edges = []
+        for pair, count in zip(pairs[order].tolist(), counts[order].tolist()):
+            a, b = self.get_pair(pair)
+            edges.append((a, b, {"weight": count}))
+        return edges
+
+    def get_nodes(self, start, end):
+        """Returns (words, labels) of the verses from start to end (inclusive), in the order they first appear.
+        The label of a word is its english in the last verse it is used."""
+        first, last = self._words(start, end)
+        words = self.data["word"][first:last]
+        ids, index = np.unique(words, return_index=True)
+        order = np.argsort(index)
+        ids = ids[order]
+
+        # Label of the last use of each word
+        last_use = len(words) - 1 - np.unique(words[::-1], return_index=True)[1][order]
+        labels = self.data["word_label"][first:last][last_use]
+
+        return [self.words[id] for id in ids.tolist()], [self.labels[label] for label in labels.tolist()]
+
+    def passage(self, start, end, label="verses"):
+        """Returns the Co_Occurence of the verses from start to end (inclusive)."""
+        nodes, labels = self.get_nodes(start, end)
+        edges = self.get_edges(start, end) # (if there are no edges, there is at most one node)
+        return Co_Occurence(nodes, nodes_attrs=labels, edges_list=edges, label=label)
+
+    def similarity(self, passages):
+        """Returns the cosine similarity of the co-occurence of every pair of passages, as a matrix.
+        passages: a list of (start, end) verse ids."""
+        counts = vstack([self.counts(start, end) for start, end in passages]).astype(np.float64)
+        norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        dot = (counts @ counts.T).toarray()
+        return dot / np.outer(norms, norms)
+
+def compile_cooccurence_matrix(verses, stopwords, path):
+    """Build the co-occurence matrix from the strongs numbers of the verse store (without the given stop words).
+    If stopwords is None, the stop words are those classified when the verses were converted."""
+    word_ptr = verses.data["word_ptr"]
+    word_sn = np.asarray(verses.data["word_sn"])
+    word_verse = np.repeat(np.arange(len(verses), dtype=np.int64), np.diff(word_ptr))
+
+    # Keep words (not stop words), in order
+    if stopwords is None:
+        stops = np.asarray(verses.data["word_stop"]) != 0
+    else:
+        sn_ids, sn_index = np.unique(word_sn, return_inverse=True)
+        stops = np.array(stopwords.stop_mask(["" if i == -1 else verses.strings[i] for i in sn_ids.tolist()]), dtype=bool)
+        stops = stops[sn_index] if len(word_sn) else np.zeros(0, dtype=bool)
+    kept = (word_sn != -1) & ~stops
+    word_sn, word_verse = word_sn[kept], word_verse[kept]
+    word_label = np.asarray(verses.data["word_eng"])[kept]
+    verse_word_ptr = np.zeros(len(verses) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(word_verse, minlength=len(verses)), out=verse_word_ptr[1:])
+
+    # Intern words (replacing synonyms)
+    sn_ids, word = np.unique(word_sn, return_inverse=True)
+    sns = [verses.strings[i] for i in sn_ids.tolist()]
+    sns = [SYNONYMS.get(sn, sn) for sn in sns]
+    words = sorted(set(sns))
+    lookup = {sn: i for i, sn in enumerate(words)}
+    word = np.array([lookup[sn] for sn in sns], dtype=np.int64)[word] if len(word) else np.empty(0, dtype=np.int64)
+
+    # Intern the pair of each word and the word before it
+    a = np.minimum(word[:-1], word[1:])
+    b = np.maximum(word[:-1], word[1:])
+    keys, join = np.unique(a * len(words) + b, return_inverse=True)
+    join = np.concatenate([[-1], join]).astype(np.int32) # the first word does not join a word
+
+    # Count the pairs that end in each verse
+    verse, pair = word_verse[1:], join[1:].astype(np.int64)
+    order = np.lexsort((pair, verse))
+    verse, pair = verse[order], pair[order]
+    new = np.ones(len(pair), dtype=bool)
+    new[1:] = (verse[1:] != verse[:-1]) | (pair[1:] != pair[:-1])
+    starts = np.flatnonzero(new)
+    count = np.diff(np.append(starts, len(pair))).astype(np.int32)
+    verse_ptr = np.zeros(len(verses) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(verse[starts], minlength=len(verses)), out=verse_ptr[1:])
+
+    # Labels
+    label_ids, word_label = np.unique(word_label, return_inverse=True)
+    labels = ["" if i == -1 else verses.strings[i] for i in label_ids.tolist()]
+
+    arrays = {
+        "word_ptr": verse_word_ptr,
+        "word": word.astype(np.int32),
+        "word_label": word_label.astype(np.int32),
+        "join": join,
+        "pair_a": (keys // max(len(words), 1)).astype(np.int32),
+        "pair_b": (keys % max(len(words), 1)).astype(np.int32),
+        "verse_ptr": verse_ptr,
+        "pair": pair[starts].astype(np.int32),
+        "count": count,
+    }
+    arrays["sn"], arrays["sn_offsets"] = pack_strings(words)
+    arrays["label"], arrays["label_offsets"] = pack_strings(labels)
+    stops_from = "verses" if stopwords is None else stopwords.path
+    write_packed(path, arrays, meta={"version": VERSION, "stopwords": stops_from})
+
+def open_cooccurence_matrix(verses, stopwords, path=r"cooccurence.bin"):
+    """Open the co-occurence matrix, (re)building it first if it is missing or out of date (e.g. the stop words changed)."""
+    stops_from = "verses" if stopwords is None else stopwords.path
+    sources = [verses.path] if stopwords is None else [verses.path, stopwords.path]
+    if is_stale(path, sources, VERSION) or CooccurenceMatrix(path).stopwords != stops_from:
+        print("Building co-occurence matrix...")
+        compile_cooccurence_matrix(verses, stopwords, path)
+
+    return CooccurenceMatrix(path)
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    from strongs import get_strongs_dict
+    import time
+    cooccurence_path = r"cooccurence.bin"
+
+    # Build the matrix (requires verses.bin and stopwords.bin)
+    verses = VerseStore(r"verses.bin")
+    compile_cooccurence_matrix(verses, get_strongs_dict().get_stopwords(), cooccurence_path)
+    matrix = CooccurenceMatrix(cooccurence_path)
+    print(f"{len(matrix)} words, {matrix.matrix.shape[1]} pairs")
+
+    start = time.perf_counter()
+    cooccurence = matrix.passage(0, 30, label="Gen.1")
+    print(f"{cooccurence} ({(time.perf_counter() - start) * 1000:.2f}ms)")
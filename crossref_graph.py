@@ -0,0 +1,316 @@
+import json
+import heapq
+from itertools import count
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from packed import write_packed, read_packed, is_stale
+
+VERSION = 2
+PRUNE_WINDOWS = 11 # the pruned length of the first 0 to 10 cross-references of every verse is precomputed
+
+def prune_length(weights):
+    """Returns how many cross-references to keep from a list of weights (sorted by weight), removing
+    low quality cross-references (i.e. they have not received many votes).
+
+    If the weights are not diverse, the cross-references with the lowest weight are removed (unless it is > 86).
+    Example: [100, 92, 82, 71, 71, 71, 71, 71, 71] ---> [100, 92, 82]"""
+    total = len(weights)
+    if total == 0:
+        return 0
+
+    diversity = len(set(weights)) / total
+    if diversity < 0.45 and weights[-1] <= 86:
+        return total - list(weights).count(weights[-1])
+    return total
+
+class CrossrefGraph:
+    """A read-only graph of cross-references, stored as compressed sparse rows (CSR).
+
+    The cross-references of verse u are indices[indptr[u]:indptr[u+1]], and their weights
+    are weight[indptr[u]:indptr[u+1]]. Each row is sorted by descending weight. The end of each cross-reference (e.g. Gen.1.3-Gen.1.5)
+    is pre-resolved to a verse id (or -1 if the cross-reference is a single verse)."""
+    def __init__(self, verses, path=r"crossrefs.bin"):
+        self.path = path
+        self.verses = verses
+        self.data, meta = read_packed(path)
+        self.type = meta["type"]
+        self.indptr = self.data["indptr"]
+        self.indices = self.data["indices"]
+        self.weight = self.data["weight"]
+        self.end = self.data["end"]
+        self.pruned = self.data["pruned"] # pruned[u, w] is prune_length of the first w cross-references of u
+        self.cost = 101 - self.weight.astype(np.int16) # inverse weights. Highest weights are now the lowest and vice versa.
+        self._costs = None
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def total_edges(self):
+        return len(self.indices)
+
+    def neighbours(self, u):
+        """Returns (ids, weights) of the cross-references of u."""
+        start, end = self.indptr[u], self.indptr[u + 1]
+        return self.indices[start:end], self.weight[start:end]
+
+    def get_crossrefs(self, u, how_many=None):
+        """Returns a list of (id, {"weight": weight}) for every cross-reference of u (sorted by weight)."""
+        ids, weights = self.neighbours(u)
+        ids, weights = ids[:how_many], weights[:how_many]
+        return [(v, {"weight": w}) for v, w in zip(ids.tolist(), weights.tolist())]
+
+    def select(self, u, how_many, preprocess=False):
+        """Returns the ids of the top how_many cross-references of u.
+
+        preprocess -- If True, low quality cross-references are removed from the top how_many + 5 (see prune_length)."""
+        start, end = self.indptr[u], self.indptr[u + 1]
+        if not preprocess:
+            return self.indices[start:end][:how_many]
+
+        window = len(range(end - start)[:how_many + 5])
+        if window < PRUNE_WINDOWS:
+            keep = self.pruned[u, window]
+        else:
+            keep = prune_length(self.weight[start:start + window].tolist())
+        return self.indices[start:start + keep][:how_many]
+
+    def _find(self, u, v):
+        """Returns the position of edge u -> v"""
+        start, end = self.indptr[u], self.indptr[u + 1]
+        found = np.flatnonzero(self.indices[start:end] == v)
+        if len(found) == 0:
+            raise KeyError(f"There is no cross-reference from {u} to {v}.")
+        return start + found[0]
+
+    def get_edge(self, u, v):
+        """Returns the edge data of u -> v (i.e. the same dict as edges.json)."""
+        i = self._find(u, v)
+        end = self.end[i]
+        return {
+            "id": int(self.data["edge_id"][i]),
+            "weight": int(self.weight[i]),
+            "type": self.type,
+            "from": self.verses.get_name(u),
+            "start": self.verses.get_name(v),
+            "end": "" if end == -1 else self.verses.get_name(end),
+        }
+
+    def get_ends(self, path):
+        """Returns the end id of every cross-reference along a path (i.e. path[i] -> path[i+1]), or -1 if it has no end."""
+        indptr, indices, end = self.indptr, self.indices, self.end
+        ends = []
+        for u, v in zip(path[:-1], path[1:]):
+            start = indptr[u]
+            ends.append(int(end[start + np.flatnonzero(indices[start:indptr[u + 1]] == v)[0]]))
+        return ends
+
+    def edges_between(self, nodes):
+        """Returns a list of the cross-references (source, target) between the given nodes."""
+        nodes = sorted(set(nodes))
+        edges = []
+
+        for u in nodes:
+            ids = self.neighbours(u)[0]
+            targets = ids[np.isin(ids, nodes)]
+            edges += [(u, v) for v in targets.tolist()]
+
+        return edges
+
+    def dijkstra(self, sources, cutoff=None, target=None):
+        """Multi-source dijkstra, where the weight of an edge is its inverse weight (101 - weight).
+
+        Returns (distances, paths), i.e. the same as nx.multi_source_dijkstra when no target is given."""
+        dist = {}
+        seen = {}
+        paths = {source: [source] for source in sources}
+        fringe = []
+        c = count()
+        indptr, indices, cost = self.indptr, self.indices, self.cost
+
+        for source in sources:
+            seen[source] = 0
+            heapq.heappush(fringe, (0, next(c), source))
+
+        while fringe:
+            d, x, v = heapq.heappop(fringe)
+            if v in dist:
+                continue # already searched this node
+            dist[v] = d
+            if v == target:
+                break
+
+            # Check every cross-reference of v
+            start, end = indptr[v], indptr[v + 1]
+            for u, w in zip(indices[start:end].tolist(), cost[start:end].tolist()):
+                vu_dist = d + w
+                if cutoff is not None and vu_dist > cutoff:
+                    continue
+                if u not in dist and (u not in seen or vu_dist < seen[u]):
+                    seen[u] = vu_dist
+                    heapq.heappush(fringe, (vu_dist, next(c), u))
+                    paths[u] = paths[v] + [u]
+
+        return dist, paths
+
+    def get_costs(self):
+        """Returns the inverse weights as a sparse matrix (built on first use)."""
+        if self._costs is None:
+            n = len(self)
+            self._costs = csr_matrix((self.cost.astype(np.float64), self.indices, self.indptr), shape=(n, n))
+        return self._costs
+
+    def search(self, sources, cutoff):
+        """Bounded multi-source dijkstra (run in native code by scipy), using inverse weights.
+
+        Returns a ClusterSearch of every node with a distance <= cutoff."""
+        sources = list(sources)
+        if cutoff < 0: # only the sources are close enough
+            return ClusterSearch(sources, np.array(sources), np.zeros(len(sources)), np.full(len(sources), -1))
+
+        dist, predecessors, x = dijkstra(self.get_costs(), indices=sources, limit=cutoff,
+                                         min_only=True, return_predecessors=True)
+        return self._to_search(sources, dist, predecessors)
+
+    def search_many(self, source_sets, cutoff):
+        """Run search for several sets of sources, sharing a single dijkstra. Returns a list of ClusterSearch.
+
+        Every source is only searched once. Each set then takes the closest of its sources for every node."""
+        if cutoff < 0:
+            return [self.search(sources, cutoff) for sources in source_sets]
+
+        sources = sorted(set().union(*source_sets))
+        rows = {source: i for i, source in enumerate(sources)}
+        dist, predecessors = dijkstra(self.get_costs(), indices=sources, limit=cutoff, return_predecessors=True)
+
+        # Only look at nodes that were reached by some source
+        reached = np.flatnonzero(np.isfinite(dist).any(axis=0))
+        dist, predecessors = dist[:, reached], predecessors[:, reached]
+        columns = np.arange(len(reached))
+
+        searches = []
+        for source_set in source_sets:
+            source_rows = [rows[source] for source in source_set]
+            closest = np.argmin(dist[source_rows], axis=0)
+            set_dist = np.full(len(self), np.inf)
+            set_predecessors = np.full(len(self), -1)
+            set_dist[reached] = dist[source_rows][closest, columns]
+            set_predecessors[reached] = predecessors[source_rows][closest, columns]
+            searches.append(self._to_search(list(source_set), set_dist, set_predecessors))
+
+        return searches
+
+    def _to_search(self, sources, dist, predecessors):
+        """Sort the reached nodes by distance and return a ClusterSearch."""
+        nodes = np.flatnonzero(np.isfinite(dist))
+        nodes = nodes[np.argsort(dist[nodes], kind="stable")]
+        return ClusterSearch(sources, nodes, dist[nodes], predecessors[nodes])
+
+    def cluster(self, sources, cutoff):
+        """Returns (nodes, distances, paths) of every node with a distance <= cutoff (the same as
+        nx.multi_source_dijkstra with a cutoff). Nodes are sorted by distance."""
+        return self.search(sources, cutoff).get(cutoff)
+
+    def shortest_path(self, source, target):
+        """Returns (distance, [source, ..., target]). Raises nx.NetworkXNoPath if target is unreachable."""
+        dist, paths = self.dijkstra({source}, target=target)
+        if target not in dist:
+            raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+        return dist[target], paths[target]
+
+class ClusterSearch:
+    """The result of a bounded dijkstra, with nodes sorted by distance.
+
+    The cluster of a smaller cutoff is a prefix of the nodes, so it can be found with a binary search
+    instead of searching the graph again."""
+    def __init__(self, sources, nodes, distances, predecessors):
+        self.sources = sources
+        self.nodes = nodes
+        self.distances = distances
+        self.predecessors = predecessors
+
+    def size(self, cutoff):
+        """Returns the number of nodes with a distance <= cutoff."""
+        if cutoff < 0:
+            return len(self.sources) # the sources are always included
+        return int(np.searchsorted(self.distances, cutoff, side="right"))
+
+    def get(self, cutoff):
+        """Returns (nodes, distances, paths) of every node with a distance <= cutoff."""
+        if cutoff < 0:
+            return list(self.sources), {x: 0 for x in self.sources}, {x: [x] for x in self.sources}
+
+        k = self.size(cutoff)
+        nodes = self.nodes[:k].tolist()
+        distances = dict(zip(nodes, self.distances[:k].astype(np.int64).tolist()))
+
+        # Build paths. A predecessor is always closer than its node, so its path already exists.
+        paths = {}
+        for node, previous in zip(nodes, self.predecessors[:k].tolist()):
+            paths[node] = [node] if previous < 0 else paths[previous] + [node]
+
+        return nodes, distances, paths
+
+def compile_crossrefs(crossrefs_paths, verses, path):
+    """Compile the edges json into a CSR graph that can be memory-mapped."""
+    lookup = {verses.get_name(i): i for i in range(len(verses))}
+    edges = {}
+
+    # Read edges. Repeated edges overwrite previous edges (the same as nx.DiGraph.add_edges_from)
+    for crossrefs_path in crossrefs_paths:
+        with open(crossrefs_path, 'r') as config_file:
+            for source, target, data in json.load(config_file):
+                edge = edges.setdefault((source, target), {})
+                edge.update(data)
+
+    # Sort edges by source, then by descending weight (edges of the same weight keep their order)
+    n = len(verses)
+    sources = np.array([u for u, v in edges], dtype=np.int64)
+    weights = np.array([int(data["weight"]) for data in edges.values()], dtype=np.int64)
+    order = np.lexsort((-weights, sources))
+    items = list(edges.items())
+
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    indices = np.empty(len(items), dtype=np.int32)
+    weight = np.empty(len(items), dtype=np.uint8)
+    end = np.empty(len(items), dtype=np.int32)
+    edge_id = np.empty(len(items), dtype=np.int32)
+
+    for i, j in enumerate(order):
+        (u, v), data = items[j]
+        indices[i] = v
+        weight[i] = int(data["weight"])
+        end[i] = lookup.get(data.get("end", ""), -1)
+        edge_id[i] = data.get("id", j)
+
+    # Precompute the pruning of the top cross-references of every verse
+    pruned = np.zeros((n, PRUNE_WINDOWS), dtype=np.uint8)
+    for u in range(n):
+        top = weight[indptr[u]:indptr[u + 1]][:PRUNE_WINDOWS - 1].tolist()
+        for window in range(PRUNE_WINDOWS):
+            pruned[u, window] = prune_length(top[:window])
+
+    arrays = {"indptr": indptr, "indices": indices, "weight": weight, "end": end, "edge_id": edge_id, "pruned": pruned}
+    edge_type = items[0][1].get("type", "crossref") if items else "crossref"
+    write_packed(path, arrays, meta={"version": VERSION, "type": edge_type})
+
+def open_crossrefs(crossrefs_paths, verses, path=r"crossrefs.bin"):
+    """Open the cross-reference graph, (re)compiling it first if it is missing or out of date."""
+    if is_stale(path, crossrefs_paths + [verses.path], VERSION):
+        print("Compiling cross references...")
+        compile_crossrefs(crossrefs_paths, verses, path)
+
+    return CrossrefGraph(verses, path)
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    crossrefs_paths = [r"edges.json", r"edges2.json"]
+    crossrefs_path = r"crossrefs.bin"
+
+    # Compile cross-references (requires verses.bin)
+    verses = VerseStore(r"verses.bin")
+    compile_crossrefs(crossrefs_paths, verses, crossrefs_path)
+    graph = CrossrefGraph(verses, crossrefs_path)
+    print(f"{len(graph)} verses, {graph.total_edges()} cross references. Cross references of 0: {graph.get_crossrefs(0)}")
@@ -38,7 +38,9 @@ class DashBuilder():
     def get_link(self, children, href="", id="", classes=""):
         return dcc.Link(children, href=href, id=id, className=classes)
 
-    def get_input(self, id="", type="", placeholder="", classes=""):
+    def get_input(self, id="", type="", placeholder="", classes="", suggestions=""):
+        if suggestions: # the id of a datalist
+            return dcc.Input(id=id, type=type, placeholder=placeholder, className=f"{classes} btn", list=suggestions)
         return dcc.Input(id=id, type=type, placeholder=placeholder, className=f"{classes} btn")
     
     def get_button(self, id="", children="", fancy=False, basic=False, classes='', styles={}):
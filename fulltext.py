@@ -0,0 +1,209 @@
+import re
+import numpy as np
+from functools import lru_cache
+from packed import write_packed, read_packed, is_stale, pack_strings, Strings
+
+VERSION = 2
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+APOSTROPHES = str.maketrans({"\u2019": "'", "\u2018": "'"}) # e.g. God’s -> God's (the same length)
+PHRASE = re.compile(r'"([^"]*)"')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STEM_CACHE = 65536 # the number of stemmed words to remember (searches are typed by users, so it is bounded)
+stemmer = None
+
+def load_stemmer():
+    """Load the Porter stemmer of NLTK (a dependency of full-text search). Called when an index is opened or built."""
+    global stemmer
+    if stemmer is None:
+        from nltk.stem.porter import PorterStemmer
+        stemmer = PorterStemmer()
+    return stemmer
+
+@lru_cache(maxsize=STEM_CACHE)
+def stem(word):
+    """Returns the (Porter) stem of a word, without its possessive, e.g. love, loves, loved and loving -> love."""
+    word = word[:-2] if word.endswith("'s") else word
+    return load_stemmer().stem(word)
+
+def tokenize(text):
+    """Returns a list of (term, start, end) of the words of text, where term is the stemmed word."""
+    return [(stem(m.group()), m.start(), m.end()) for m in TOKEN.finditer(text.lower().translate(APOSTROPHES))]
+
+class FullTextIndex:
+    """An inverted index of the content of every verse, with positional postings and BM25 ranking.
+
+    The postings of term t are post_doc[term_ptr[t]:term_ptr[t+1]] (sorted by verse id). The positions of
+    posting p are positions[pos_ptr[p]:pos_ptr[p+1]]."""
+    def __init__(self, verses, path=r"fulltext.bin"):
+        self.path = path
+        self.verses = verses
+        self.data, meta = read_packed(path)
+        self.avg_length = meta["avg_length"]
+        terms = Strings(self.data["terms"], self.data["term_offsets"])
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.lengths = self.data["doc_length"].astype(np.float64)
+        load_stemmer() # (so the first search does not import NLTK)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def postings(self, term):
+        """Returns (verse ids, term frequencies, posting positions) of a stemmed term."""
+        if term not in self.terms:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), 0
+        t = self.terms[term]
+        start, end = self.data["term_ptr"][t:t + 2]
+        return self.data["post_doc"][start:end], self.data["post_tf"][start:end], start
+
+    def positions(self, term, id):
+        """Returns the positions of a stemmed term in a verse."""
+        docs, tfs, start = self.postings(term)
+        i = np.searchsorted(docs, id)
+        if i == len(docs) or docs[i] != id:
+            return np.empty(0, dtype=np.int32)
+        p = start + i
+        return self.data["positions"][self.data["pos_ptr"][p]:self.data["pos_ptr"][p + 1]]
+
+    def _contains_phrase(self, terms, id):
+        """Checks whether the verse contains the (stemmed) terms next to each other."""
+        matches = set(self.positions(terms[0], id).tolist())
+        for i, term in enumerate(terms[1:], 1):
+            matches &= {x - i for x in self.positions(term, id).tolist()}
+            if not matches:
+                return False
+        return True
+
+    def _phrase_ids(self, terms):
+        """Returns the verse ids that contain the phrase."""
+        ids = None
+        for term in terms:
+            docs = self.postings(term)[0]
+            ids = docs if ids is None else np.intersect1d(ids, docs, assume_unique=True)
+        return [id for id in ids.tolist() if self._contains_phrase(terms, id)]
+
+    def search(self, query, limit=10):
+        """Returns the verses that best match the query as a list of {"id", "score", "snippet"}.
+
+        Words in quotes (e.g. "bread of life") must appear together, as a phrase."""
+        terms = [term for term, x, y in tokenize(query)]
+        phrases = [[term for term, x, y in tokenize(phrase)] for phrase in PHRASE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        if not terms:
+            return []
+
+        # BM25
+        n = len(self.lengths)
+        scores = np.zeros(n)
+        for term in set(terms):
+            docs, tfs, x = self.postings(term)
+            if len(docs) == 0:
+                continue
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            tfs = tfs.astype(np.float64)
+            norm = K1 * (1 - B + B * self.lengths[docs] / self.avg_length)
+            scores[docs] += idf * tfs * (K1 + 1) / (tfs + norm)
+
+        # Only keep verses that contain every phrase
+        if phrases:
+            allowed = set(self._phrase_ids(phrases[0]))
+            for phrase in phrases[1:]:
+                allowed &= set(self._phrase_ids(phrase))
+            mask = np.zeros(n, dtype=bool)
+            mask[list(allowed)] = True
+            scores[~mask] = 0
+
+        # Top results
+        found = np.flatnonzero(scores > 0)
+        if len(found) > limit:
+            found = found[np.argpartition(-scores[found], limit - 1)[:limit]]
+        found = found[np.lexsort((found, -scores[found]))]
+
+        return [{"id": int(id), "score": round(float(scores[id]), 4), "snippet": self.snippet(id, terms)} for id in found]
+
+    def snippet(self, id, terms, window=12):
+        """Returns the words around the first match in the content of a verse. Matches are #highlighted#."""
+        content = self.verses.get_content(id)
+        tokens = tokenize(content)
+        terms = set(terms)
+        matches = [i for i, (term, x, y) in enumerate(tokens) if term in terms]
+        if not matches:
+            return content
+
+        # Words in the window
+        first = max(matches[0] - window // 2, 0)
+        last = min(first + window, len(tokens)) - 1
+        start = 0 if first == 0 else tokens[first][1]
+        end = len(content) if last == len(tokens) - 1 else tokens[last][2]
+
+        # Highlight
+        snippet = ""
+        position = start
+        for i in matches:
+            if first <= i <= last:
+                term, x, y = tokens[i]
+                snippet += f"{content[position:x]}#{content[x:y]}#"
+                position = y
+        snippet += content[position:end]
+
+        return ("..." if start > 0 else "") + snippet + ("..." if end < len(content) else "")
+
+def compile_fulltext(verses, path):
+    """Build the inverted index of the content of every verse."""
+    index = {} # term: {id: [positions]}
+    doc_length = np.zeros(len(verses), dtype=np.int32)
+
+    for id in range(len(verses)):
+        tokens = tokenize(verses.get_content(id))
+        doc_length[id] = len(tokens)
+        for position, (term, x, y) in enumerate(tokens):
+            index.setdefault(term, {}).setdefault(id, []).append(position)
+
+    # Pack postings (terms are sorted, as are the ids of each term)
+    terms = sorted(index)
+    term_ptr, post_doc, post_tf, pos_ptr, positions = [0], [], [], [0], []
+    for term in terms:
+        for id, term_positions in index[term].items():
+            post_doc.append(id)
+            post_tf.append(len(term_positions))
+            positions += term_positions
+            pos_ptr.append(len(positions))
+        term_ptr.append(len(post_doc))
+
+    arrays = {
+        "doc_length": doc_length,
+        "term_ptr": np.array(term_ptr, dtype=np.int64),
+        "post_doc": np.array(post_doc, dtype=np.int32),
+        "post_tf": np.array(post_tf, dtype=np.int32),
+        "pos_ptr": np.array(pos_ptr, dtype=np.int64),
+        "positions": np.array(positions, dtype=np.int32),
+    }
+    arrays["terms"], arrays["term_offsets"] = pack_strings(terms)
+    avg_length = float(doc_length.mean()) if len(doc_length) else 0.0
+    write_packed(path, arrays, meta={"version": VERSION, "avg_length": avg_length})
+
+def open_fulltext(verses, path=r"fulltext.bin"):
+    """Open the full-text index, (re)building it first if it is missing or out of date."""
+    if is_stale(path, [verses.path], VERSION):
+        print("Building full-text index...")
+        compile_fulltext(verses, path)
+
+    return FullTextIndex(verses, path)
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    import time
+    fulltext_path = r"fulltext.bin"
+
+    # Build the index (requires verses.bin)
+    verses = VerseStore(r"verses.bin")
+    compile_fulltext(verses, fulltext_path)
+    index = FullTextIndex(verses, fulltext_path)
+
+    for query in ['"bread of life"', "love your neighbour", "light"]:
+        start = time.perf_counter()
+        results = index.search(query, limit=5)
+        print(f"{query} ({(time.perf_counter() - start) * 1000:.2f}ms): {results}")
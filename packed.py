@@ -0,0 +1,126 @@
+import json
+import mmap
+import os
+import numpy as np
+
+# A small binary container for the compiled data files (e.g. verses.bin).
+#
+# Layout: MAGIC | header length (8 bytes) | json header | aligned array data
+#
+# The header stores some metadata and the dtype, shape and offset of every array.
+# Files are read with mmap, so arrays are only paged in when they are used and the
+# pages are shared between every process that opens the same file.
+
+MAGIC = b"BNPK"
+ALIGN = 64
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def write_packed(path, arrays, meta={}):
+    """Write a dict of numpy arrays (and a dict of json metadata) to the given path."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = {"meta": meta, "arrays": {}}
+    offset = 0
+
+    # Work out where every array will live
+    for name, array in arrays.items():
+        offset = _align(offset)
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    encoded = json.dumps(header).encode("utf-8")
+    start = _align(len(MAGIC) + 8 + len(encoded))
+
+    # Write to a temporary file first, so that readers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.write(b"\0" * (start + header["arrays"][name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+    print(f"Successfully written {len(arrays)} arrays to {path}")
+
+def read_packed(path):
+    """Memory-map a packed file. Returns (arrays, meta) where arrays are read-only views of the file."""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a packed file.")
+
+    # Read header
+    size = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + size].decode("utf-8"))
+    start = _align(len(MAGIC) + 8 + size)
+
+    # Map arrays
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + info["offset"])
+        arrays[name] = array.reshape(info["shape"])
+
+    return arrays, header["meta"]
+
+def is_stale(path, sources, version):
+    """Checks whether a packed file is missing, older than any of its sources, or of a different version."""
+    if not os.path.exists(path):
+        return True
+
+    # Is a source newer than the compiled file?
+    modified = os.path.getmtime(path)
+    for source in sources:
+        if os.path.exists(source) and os.path.getmtime(source) > modified:
+            return True
+
+    try:
+        arrays, meta = read_packed(path)
+    except ValueError:
+        return True
+
+    return meta.get("version") != version
+
+def pack_strings(strings):
+    """Encode a list of strings into a string pool. Returns (pool, offsets), where string i is pool[offsets[i]:offsets[i+1]]."""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+    pool = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return pool, offsets
+
+class StringPool:
+    """Builds a pool of unique strings. Each string is given an integer id."""
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, string):
+        """Add string (if it is new) and return its id."""
+        if string not in self.ids:
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return self.ids[string]
+
+    def pack(self):
+        return pack_strings(self.strings)
+
+class Strings:
+    """A read-only list of strings backed by a packed string pool."""
+    def __init__(self, pool, offsets):
+        self.pool = pool
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.pool[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
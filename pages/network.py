@@ -25,15 +25,19 @@ register_page("network", path_template='/<book>/<chapter>-<verse>', layout=netwo
         Output('main-verse', 'children'),
         Output('graph', 'children'),
         Input('search', 'value'),
+        Input('search', 'n_submit'),
         Input('url', 'pathname'),
 )
-def set_ids(search, url):
+def set_ids(search, submit, url):
     trigger = ctx.triggered_id
     page = dc.get_page_name(url, page_registry)
     print(f"Your trigger: {trigger} Your url is: {url} Your search is: {search} Your page is {page}")
     id1, id2 = BUILDER.get_id_by_url(url, page=page)
 
-    if trigger == 'search' and search != None:
+    if trigger == 'search' and search != None and 'search.n_submit' in ctx.triggered_prop_ids:
+        print(f"searching text for... {search}")
+        id1 = BUILDER.get_id_by_text(search, id1) # only search the text once the search is submitted
+    elif trigger == 'search' and search != None:
         print(f"searching for... {search}")
         id1 = BUILDER.get_id_by_search(search, id1)
     #elif search2:
@@ -57,6 +61,15 @@ def set_ids(search, url):
     return id1, id2, search, url, verse, graph
 
 
+@callback(
+        Output('search-suggestions', 'children'),
+        Input('search', 'value'),
+)
+def set_suggestions(search):
+    if not search:
+        raise PreventUpdate
+    return BUILDER.get_suggestions(search)
+
 @callback(
         Output('crossrefs', 'children'),
         Output('themes', 'children'),
@@ -165,9 +178,11 @@ def hover(nodeData):
     # Input('info-box-wrapper', 'n_clicks'),
     Input('main-wrapper', 'n_clicks'),
     State("breakpoints", "width"),
+    State('id-store', 'data'),
+    State('id-store2', 'data'),
     # Make main wrapper z-index == 10 when info box is open ... this will solve it
 )
-def update_styles(nodeData, clicked, theme, clicked2, window_width):  
+def update_styles(nodeData, clicked, theme, clicked2, window_width, id1, id2):  
     default_stylesheet = STYLESHEET.get_default()
     trigger = ctx.triggered_id
 
@@ -212,7 +227,7 @@ def update_styles(nodeData, clicked, theme, clicked2, window_width):
     
     if trigger == 'themes':
         # Highlight themes
-        stylesheet = select_theme(theme)
+        stylesheet = select_theme(theme, id1, id2)
     else:
         stylesheet = STYLESHEET.get_default()
     
@@ -226,17 +241,18 @@ clientside_callback(
     Input('info-box', 'children')
 )
 
-def select_theme(theme):
+def select_theme(theme, id1, id2=None):
     # initialise data
-    # theme = 'kingdom of god'
-    key = f"theme.{theme}"
-    # key = f"theme.jesus"
-    # key = f"fullname ^= 'Matt'"
-    x = ''
-    operator = ''
-    selector = STYLESHEET._selector(x, key, operator=operator)
+    # theme = 'kingdomofgod'
     stylesheet = STYLESHEET.get_default()
-    stylesheet.extend(STYLESHEET.get_highlights(selector))
+    if not theme or id1 in [None, '']:
+        return stylesheet
+
+    # Look up the nodes of the theme in the topic index
+    ids = BUILDER.get_theme_ids(theme, id1, id2)
+    if ids:
+        selector = ", ".join(STYLESHEET._node_selector(id) for id in ids)
+        stylesheet.extend(STYLESHEET.get_highlights(selector))
     return stylesheet
 
 
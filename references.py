@@ -0,0 +1,38 @@
+class VerseLookup:
+    """An in-memory index of verse references (e.g. Matt.3.3), mapping names to ids and ids to names.
+
+    Built once from the verse store (the same names as verse_lookup.json), so lookups do not read any files."""
+    def __init__(self, verses):
+        self.verses = verses
+        self.ids = {verses.get_name(id): id for id in range(len(verses))}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def get_id(self, name, default=""):
+        """Returns the id of the given reference (or default if it does not exist)."""
+        return self.ids.get(name, default)
+
+    def get_name(self, id):
+        """Returns the reference of the given id."""
+        return self.verses.get_name(id)
+
+    def get_ids(self, names, default=""):
+        """Returns the id of each of the given references."""
+        ids = self.ids
+        return [ids.get(name, default) for name in names]
+
+    def get_names(self, ids):
+        """Returns the reference of each of the given ids."""
+        return [self.verses.get_name(id) for id in ids]
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    verses_path = r"verses.bin"
+
+    lookup = VerseLookup(VerseStore(verses_path))
+    print(f"{len(lookup)} references. Gen.1.1: {lookup.get_id('Gen.1.1')}, 0: {lookup.get_name(0)}")
+    print(f"Batch: {lookup.get_ids(['Gen.1.1', 'Gen.1.2', 'Not.1.1'])}")
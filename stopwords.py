@@ -0,0 +1,85 @@
+import re
+import numpy as np
+from packed import write_packed, read_packed, is_stale
+
+VERSION = 1
+STRONGS_ID = re.compile(r"([HG])([1-9][0-9]*)")
+
+class StopWords:
+    """Whether each strongs number is a (probable) stop word, classified once by compile_stopwords.
+
+    Each language (H or G) has a stop array and a known array, indexed by the number of the strongs
+    id (e.g. G26 -> 26). Looking up a word does not need NLTK."""
+    def __init__(self, path=r"stopwords.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+
+    def _find(self, id):
+        """Returns (language, number) of a strongs id. Raises KeyError if it is not in the dictionary."""
+        match = STRONGS_ID.fullmatch(id)
+        if match is None:
+            raise KeyError(id)
+
+        language, number = match.group(1), int(match.group(2))
+        known = self.data[f"known_{language}"]
+        if number >= len(known) or not known[number]:
+            raise KeyError(id)
+        return language, number
+
+    def __contains__(self, id):
+        try:
+            self._find(id)
+        except KeyError:
+            return False
+        return True
+
+    def is_stopword(self, id):
+        """Checks whether a strong value is a (probable) stop word. Raises KeyError if it is not in the dictionary."""
+        language, number = self._find(id)
+        return bool(self.data[f"stop_{language}"][number])
+
+    def stop_mask(self, ids):
+        """Returns a list of whether each strongs id is a stop word (unknown ids are not stop words)."""
+        return [id in self and self.is_stopword(id) for id in ids]
+
+def compile_stopwords(strongs_dict, path):
+    """Classify every entry of the strongs dictionary (using NLTK) and write the stop words to path."""
+    numbers = {"H": [], "G": []}
+    stops = {"H": [], "G": []}
+
+    for id in strongs_dict.get_dict():
+        match = STRONGS_ID.fullmatch(id)
+        if match is None:
+            continue # not a strongs number
+        language = match.group(1)
+        numbers[language].append(int(match.group(2)))
+        stops[language].append(strongs_dict.classify_stopword(id))
+
+    arrays = {}
+    for language in numbers:
+        size = max(numbers[language], default=0) + 1
+        arrays[f"stop_{language}"] = np.zeros(size, dtype=np.uint8)
+        arrays[f"known_{language}"] = np.zeros(size, dtype=np.uint8)
+        arrays[f"stop_{language}"][numbers[language]] = stops[language]
+        arrays[f"known_{language}"][numbers[language]] = 1
+
+    write_packed(path, arrays, meta={"version": VERSION})
+
+def open_stopwords(strongs_dict, path=r"stopwords.bin"):
+    """Open the stop words. They are classified offline (with NLTK) by running stopwords.py, never at runtime,
+    so this raises a RuntimeError if they are missing or older than the strongs dictionary."""
+    if is_stale(path, [strongs_dict.strongs_path], VERSION):
+        raise RuntimeError(f"{path} is missing or out of date. Run stopwords.py to classify the stop words.")
+
+    return StopWords(path)
+
+if __name__ == "__main__":
+    from strongs import get_strongs_dict
+    stopwords_path = r"stopwords.bin"
+
+    # Classify every strongs number (requires NLTK and its punkt_tab tokenizer)
+    strongs_dict = get_strongs_dict()
+    compile_stopwords(strongs_dict, stopwords_path)
+    stopwords = StopWords(stopwords_path)
+    for id in ["G3004", "G2532", "G191", "H638", "H4480"]:
+        print(f"{id}: {stopwords.is_stopword(id) if id in stopwords else 'unknown'}")
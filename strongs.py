@@ -1,8 +1,12 @@
 import json
+import threading
+from collections.abc import Mapping
 # from nltk.corpus import stopword
 from random import choice, sample
 import re
-from nltk.tokenize import word_tokenize
+import numpy as np
+from packed import write_packed, read_packed, is_stale, StringPool, Strings
+from stopwords import open_stopwords
 # import nltk
  
 #  *
@@ -84,10 +88,93 @@ STOPWORDS_ENGLISH = ['i', 'me', 'my', 'myself', 'we', 'our', 'ours',
 
 EXTRA_STOPS = ['against', 'between', 'during', 'before', 'after', 'above', 'below', 'up', 'down', 'over', 'under', 'further']
 STOP_LINGUISTICS = ['preposition', ' article', 'conjunction', " prep ", " conj ", " inrg ", "pronoun"]
+
+# Synonym pairs. e.g. key is an alternate word for value
+SYNONYMS = {'G2983': 'G1209', 'G4280': 'G4277', 'G2046': 'G2036', 
+            'G3700': 'G3708', 'G2908': 'G2909', 'G5315': 'G2068'}
+
+VERSION = 1
+
+class StrongsEntries(Mapping):
+    """A read-only, memory-mapped dictionary of strongs entries (i.e. "strong_number": {info}).
+
+    Entries are only decoded when requested. An entry only has the fields it has in the json."""
+    def __init__(self, path=r"strongs.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+        self.fields = meta["fields"]
+        self.strings = Strings(self.data["strings"], self.data["string_offsets"])
+        self.rows = {sn: i for i, sn in enumerate(Strings(self.data["sn"], self.data["sn_offsets"]))}
+
+    def __getitem__(self, id):
+        row = self.rows[id]
+        entry = {}
+        for field in self.fields:
+            value = self.data[f"field_{field}"][row]
+            if value != -1:
+                entry[field] = self.strings[value]
+        return entry
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, id):
+        return id in self.rows
+
+def compile_strongs(strongs_path, path):
+    """Compile the strongs dictionary json into a packed file that can be memory-mapped."""
+    with open(strongs_path, 'r', encoding='utf-8') as config_file:
+        dictionary = json.load(config_file)
+
+    fields = sorted({field for entry in dictionary.values() for field in entry})
+    strings = StringPool()
+    sns = StringPool()
+    columns = {field: [] for field in fields}
+
+    for sn, entry in dictionary.items():
+        sns.add(sn)
+        for field in fields:
+            columns[field].append(strings.add(str(entry[field])) if field in entry else -1)
+
+    arrays = {f"field_{field}": np.array(values, dtype=np.int32) for field, values in columns.items()}
+    arrays["strings"], arrays["string_offsets"] = strings.pack()
+    arrays["sn"], arrays["sn_offsets"] = sns.pack()
+    write_packed(path, arrays, meta={"version": VERSION, "fields": fields})
+
+def open_strongs(strongs_path, path=r"strongs.bin"):
+    """Open the memory-mapped strongs dictionary, (re)compiling it first if it is missing or out of date."""
+    if is_stale(path, [strongs_path], VERSION):
+        print("Compiling Strongs Dictionary...")
+        compile_strongs(strongs_path, path)
+
+    return StrongsEntries(path)
+
+# The strongs dictionary shared by every BibleNetwork, Co_Occurence and report (see get_strongs_dict)
+_strongs_dict = None
+_strongs_lock = threading.Lock()
+
+def get_strongs_dict():
+    """Returns the shared (read-only) strongs dictionary. It is loaded on first use."""
+    global _strongs_dict
+    if _strongs_dict is None:
+        with _strongs_lock:
+            if _strongs_dict is None:
+                _strongs_dict = StrongsDict()
+    return _strongs_dict
+
 class StrongsDict():
-    def __init__(self):
+    """The strongs dictionary. Use get_strongs_dict() to share a single dictionary, instead of reading it again.
+
+    mapped -- If True, entries are read from a memory-mapped file (compiled from the json) instead of loading the json."""
+    def __init__(self, mapped=True):
         self.strongs_path = r"strongs-dictionary.json"
-        self.dictionary = self._read_dict()
+        self.strongs_bin_path = r"strongs.bin" # compiled from strongs_path
+        self.stopwords_path = r"stopwords.bin" # classified from strongs_path (see stopwords.py)
+        self.stopwords = None
+        self.dictionary = open_strongs(self.strongs_path, self.strongs_bin_path) if mapped else self._read_dict()
     
     def get_dict(self):
         return self.dictionary
@@ -137,7 +224,18 @@ class StrongsDict():
         return data_loaded
     
     def is_stopword(self, id):
-        """Checks whether a strong value is a (probable) stop word.""" 
+        """Checks whether a strong value is a (probable) stop word. Raises KeyError if it is not in the dictionary."""
+        return self.get_stopwords().is_stopword(id)
+
+    def get_stopwords(self):
+        """Returns the precomputed stop words (classified offline by stopwords.py, see open_stopwords)."""
+        if self.stopwords is None:
+            self.stopwords = open_stopwords(self, self.stopwords_path)
+        return self.stopwords
+
+    def classify_stopword(self, id):
+        """Checks whether a strong value is a (probable) stop word (slow, see is_stopword).""" 
+        from nltk.tokenize import word_tokenize # only needed to classify stop words
         words = self.get_words(id).replace(" ", "`").replace("...", ",")
         words = re.sub(r"\(.+?\)", '', words) # replace any "( ... )", as this extra information will confuse the stop-checker
         words = re.sub(r"\[.+?\]", '', words) # replace any "[ ... ]"
@@ -169,8 +267,7 @@ class StrongsDict():
 
     def get_synonyms(self):
         """Returns a dictionary of synonym pairs. e.g. key is an alternate word for value"""
-        synonyms = {'G2983': 'G1209', 'G4280': 'G4277', 'G2046': 'G2036', 
-                    'G3700': 'G3708', 'G2908': 'G2909', 'G5315': 'G2068'}
+        synonyms = dict(SYNONYMS)
 
         # CODE TO IDENTIFY SYNONYMS
         # for word, values in self.get_dict().items():
@@ -189,7 +286,7 @@ class StrongsDict():
         return synonyms
             
 if __name__ == "__main__":#
-    dictionary = StrongsDict()
+    dictionary = get_strongs_dict()
     ids = "G3004"
     id2 = "G2532"
     id3 = "G191"
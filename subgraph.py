@@ -0,0 +1,80 @@
+from types import MappingProxyType
+import networkx as nx
+
+class Subgraph:
+    """An immutable subgraph of the bible, which is safe to share between requests (and threads).
+
+    nodes -- the verse ids in the subgraph (sorted)
+    edges -- the cross-references (source, target) between the nodes
+    paths -- the path between the active verse and each node
+    lengths -- the length of the path between the active verse and each node
+    positions -- the (x, y) position of each node, or None if there is no layout
+    active -- the verse the subgraph was built around"""
+    __slots__ = ("nodes", "edges", "paths", "lengths", "positions", "active")
+
+    def __init__(self, nodes, edges, paths, lengths, positions=None, active=None):
+        nodes = tuple(sorted(nodes))
+        values = {
+            "nodes": nodes,
+            "edges": tuple((u, v) for u, v in edges),
+            "paths": MappingProxyType({node: tuple(paths[node]) for node in nodes}),
+            "lengths": MappingProxyType({node: lengths[node] for node in nodes}),
+            "positions": None if positions is None else MappingProxyType({node: tuple(positions[node]) for node in nodes}),
+            "active": active,
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("A Subgraph cannot be changed.")
+
+    def __delattr__(self, key):
+        raise AttributeError("A Subgraph cannot be changed.")
+
+    def __reduce__(self):
+        positions = None if self.positions is None else dict(self.positions)
+        return (Subgraph, (self.nodes, self.edges, dict(self.paths), dict(self.lengths), positions, self.active))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.lengths
+
+    def __eq__(self, other):
+        return isinstance(other, Subgraph) and self.__reduce__() == other.__reduce__()
+
+    def __hash__(self):
+        return hash((self.nodes, self.edges, self.active))
+
+    def __repr__(self):
+        return f"Subgraph of {self.active} with {len(self.nodes)} nodes and {len(self.edges)} edges"
+
+    def with_positions(self, positions):
+        """Returns a copy of this subgraph with the given positions."""
+        return Subgraph(self.nodes, self.edges, self.paths, self.lengths, positions, self.active)
+
+    def to_networkx(self):
+        """Returns a new DiGraph of this subgraph (with path, length and position attributes)."""
+        G = nx.DiGraph()
+        for node in self.nodes:
+            attrs = {"path": list(self.paths[node]), "length": self.lengths[node]}
+            if self.positions is not None:
+                attrs["position"] = self.positions[node]
+            G.add_node(node, **attrs)
+        G.add_edges_from(self.edges)
+        return G
+
+    def to_dict(self):
+        """Returns this subgraph as a dict (e.g. to serialise it as json)."""
+        return {
+            "nodes": list(self.nodes),
+            "edges": [list(edge) for edge in self.edges],
+            "paths": {node: list(path) for node, path in self.paths.items()},
+            "lengths": dict(self.lengths),
+            "positions": None if self.positions is None else {node: list(x) for node, x in self.positions.items()},
+            "active": self.active,
+        }
@@ -0,0 +1,109 @@
+import os
+from multiprocessing import Pool
+import numpy as np
+from packed import write_packed, read_packed, is_stale
+
+VERSION = 1
+
+class SubgraphIndex:
+    """A precomputed index of the best subgraph of every verse (see BibleNetwork.get_best_subgraph).
+
+    For every verse, it stores the selected (factor, cutoff) and the nodes of the subgraph,
+    including the length and path between the verse and every node."""
+    def __init__(self, path=r"subgraphs.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+        self.pairs = [tuple(pair) for pair in meta["pairs"]]
+        self.algorithm = meta.get("algorithm")
+
+    def __len__(self):
+        return len(self.data["pair"])
+
+    def get_pair(self, id):
+        """Returns the (factor, cutoff) that was selected for the given verse."""
+        return self.pairs[self.data["pair"][id]]
+
+    def get(self, id):
+        """Returns the subgraph of the given verse as (nodes, lengths, paths)."""
+        start, end = self.data["node_ptr"][id:id + 2]
+        nodes = self.data["nodes"][start:end].tolist()
+        lengths = dict(zip(nodes, self.data["lengths"][start:end].tolist()))
+
+        # Unpack paths
+        path_ptr = self.data["path_ptr"][start:end + 1]
+        path_nodes = self.data["path_nodes"][path_ptr[0]:path_ptr[-1]].tolist()
+        path_ptr = (path_ptr - path_ptr[0]).tolist()
+        paths = {node: path_nodes[path_ptr[i]:path_ptr[i + 1]] for i, node in enumerate(nodes)}
+
+        return nodes, lengths, paths
+
+def open_subgraph_index(path, crossrefs, pairs, algorithm):
+    """Open the subgraph index, if it exists and was built from the current cross-references, (factor, cutoff)
+    pairs and version of the subgraph algorithm. Otherwise, returns None."""
+    if not os.path.exists(path):
+        return None
+    if is_stale(path, [crossrefs.path], VERSION):
+        print(f"{path} is out of date. Run subgraph_index.py to rebuild it.")
+        return None
+
+    index = SubgraphIndex(path)
+    if index.pairs != [tuple(pair) for pair in pairs] or index.algorithm != algorithm:
+        print(f"{path} was built with other subgraph pairs or algorithm. Run subgraph_index.py to rebuild it.")
+        return None
+
+    return index
+
+# Every process of the build has its own BibleNetwork
+_network = None
+
+def _init_worker():
+    global _network
+    from BibleNetwork import BibleNetwork
+    _network = BibleNetwork()
+
+def _select_subgraphs(ids):
+    """Compute the best subgraph of each id. Returns a list of (id, pair, nodes, lengths, paths)."""
+    results = []
+    for id in ids:
+        pair, G = _network._select_subgraph(id)
+        nodes = list(G.nodes)
+        lengths = [G.lengths[node] for node in nodes]
+        paths = [list(G.paths[node]) for node in nodes]
+        results.append((id, pair, nodes, lengths, paths))
+
+    return results
+
+def build_subgraph_index(total, pairs, algorithm, path=r"subgraphs.bin", processes=None, chunksize=64):
+    """Compute the best subgraph of every verse (in parallel) and write the index to the given path."""
+    processes = os.cpu_count() if processes is None else processes
+    chunks = [list(range(i, min(i + chunksize, total))) for i in range(0, total, chunksize)]
+    results = [None] * total
+
+    with Pool(processes, initializer=_init_worker) as pool:
+        for done, chunk in enumerate(pool.imap_unordered(_select_subgraphs, chunks)):
+            for id, pair, nodes, lengths, paths in chunk:
+                results[id] = (pairs.index(pair), nodes, lengths, paths)
+            print(f"Computed {done + 1}/{len(chunks)} chunks...")
+
+    # Pack results
+    pair = np.array([x[0] for x in results], dtype=np.uint8)
+    node_ptr = np.zeros(total + 1, dtype=np.int64)
+    np.cumsum([len(x[1]) for x in results], out=node_ptr[1:])
+    nodes = np.array([node for x in results for node in x[1]], dtype=np.int32)
+    lengths = np.array([length for x in results for length in x[2]], dtype=np.int32)
+    all_paths = [path for x in results for path in x[3]]
+    path_ptr = np.zeros(len(all_paths) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in all_paths], out=path_ptr[1:])
+    path_nodes = np.array([node for x in all_paths for node in x], dtype=np.int32)
+
+    arrays = {"pair": pair, "node_ptr": node_ptr, "nodes": nodes, "lengths": lengths,
+              "path_ptr": path_ptr, "path_nodes": path_nodes}
+    write_packed(path, arrays, meta={"version": VERSION, "pairs": pairs, "algorithm": algorithm})
+
+if __name__ == "__main__":
+    from BibleNetwork import BibleNetwork, SUBGRAPH_PAIRS, SUBGRAPH_ALGORITHM
+    subgraphs_path = r"subgraphs.bin"
+
+    # Build the index of every verse (this takes a while)
+    network = BibleNetwork()
+    build_subgraph_index(len(network.verses), SUBGRAPH_PAIRS, SUBGRAPH_ALGORITHM, subgraphs_path)
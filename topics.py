@@ -0,0 +1,179 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from packed import write_packed, read_packed, is_stale, pack_strings, Strings
+
+VERSION = 2
+
+def sanitise(text):
+    """Returns the name of a topic as used by themes (e.g. "kingdom of god" -> kingdomofgod)."""
+    return ''.join(char for char in text if char.isalnum())
+
+class TopicIndex:
+    """An index of the verses of every topic, keyed by the sanitised name of the topic.
+
+    The verses of topic t are post_verse[topic_ptr[t]:topic_ptr[t+1]] (sorted by id), with their weights
+    in post_weight. If several topics have the same sanitised name, a verse has the highest of their weights.
+
+    Every topic (e.g. "kingdom of god") also has an integer id. The topics of verse v are
+    verse_topic[verse_ptr[v]:verse_ptr[v+1]], i.e. the rows of a sparse verse x topic matrix."""
+    def __init__(self, path=r"topics.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+        self.names = {name: i for i, name in enumerate(Strings(self.data["name"], self.data["name_offsets"]))}
+        self.labels = Strings(self.data["label"], self.data["label_offsets"])
+
+        # Topics (with their pre-sanitised names)
+        self.topics = list(Strings(self.data["topic"], self.data["topic_offsets"]))
+        names = list(self.names)
+        self.sanitised = [names[i] for i in self.data["topic_name"].tolist()]
+
+        # Verse x topic matrices (for weighted and unweighted counts)
+        verse_ptr, verse_topic = self.data["verse_ptr"], self.data["verse_topic"]
+        shape = (len(verse_ptr) - 1, len(self.topics))
+        weights = self.data["verse_weight"] / 100 + 1
+        self.weighted = csr_matrix((weights, verse_topic, verse_ptr), shape=shape)
+        self.unweighted = csr_matrix((np.ones(len(verse_topic)), verse_topic, verse_ptr), shape=shape)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, topic):
+        return sanitise(topic) in self.names
+
+    def _postings(self, topic):
+        topic = sanitise(topic)
+        if topic not in self.names:
+            return slice(0, 0)
+        t = self.names[topic]
+        return slice(self.data["topic_ptr"][t], self.data["topic_ptr"][t + 1])
+
+    def get_label(self, topic):
+        """Returns the label of a topic (e.g. kingdomofgod -> kingdom of god)."""
+        return self.labels[self.names[sanitise(topic)]]
+
+    def get_verses(self, topic):
+        """Returns (ids, weights) of the verses of a topic, sorted by id."""
+        postings = self._postings(topic)
+        return self.data["post_verse"][postings], self.data["post_weight"][postings]
+
+    def get_weights(self, topic):
+        """Returns a dict of verse id: weight for every verse of the topic."""
+        ids, weights = self.get_verses(topic)
+        return dict(zip(ids.tolist(), weights.tolist()))
+
+    def top_verses(self, topic, k=10):
+        """Returns the k verses with the highest weight for the topic as a list of (id, weight)."""
+        ids, weights = self.get_verses(topic)
+        top = np.argsort(-weights.astype(np.int64), kind="stable")[:k]
+        return list(zip(ids[top].tolist(), weights[top].tolist()))
+
+    def get_topics(self, id):
+        """Returns a dict of sanitised topic: weight of a verse."""
+        start, end = self.data["verse_ptr"][id:id + 2]
+        topics = self.data["verse_topic"][start:end].tolist()
+        weights = self.data["verse_weight"][start:end].tolist()
+        return {self.sanitised[topic]: weight for topic, weight in zip(topics, weights)}
+
+    def count(self, ids, weighted=True, k=None, sort=True):
+        """Count the topics of the given verses. A topic counts (weight / 100 + 1) per verse if weighted, otherwise 1.
+
+        Returns a list of (topic, count) sorted by count, or only the top k if k is given. Ties keep the
+        order in which the topics first appear (as does the list if it is not sorted)."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        matrix = self.weighted if weighted else self.unweighted
+
+        # The entries of the rows of the verses (in order)
+        verse_ptr = matrix.indptr
+        starts, lengths = verse_ptr[ids], verse_ptr[ids + 1] - verse_ptr[ids]
+        positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+        # Sum the rows. bincount adds the entries in order, so equal counts are exactly equal (and stay ties)
+        counts = np.bincount(matrix.indices[positions], weights=matrix.data[positions], minlength=len(self.topics))
+
+        # The topics of the verses, in order of first appearance
+        topics, first = np.unique(matrix.indices[positions], return_index=True)
+        rank = np.empty(len(self.topics), dtype=np.int64)
+        rank[topics] = first
+
+        # Top topics
+        if k is not None and k < len(topics):
+            kth = -np.partition(-counts[topics], k - 1)[k - 1]
+            topics = topics[counts[topics] >= kth] # the top k (and any ties with the kth topic)
+        if sort:
+            topics = topics[np.lexsort((rank[topics], -counts[topics]))][:k]
+        else:
+            topics = topics[np.argsort(rank[topics])]
+
+        if not weighted:
+            counts = counts.astype(np.int64)
+        return [(self.topics[topic], counts[topic].item()) for topic in topics.tolist()]
+
+    def filter(self, topic, ids):
+        """Returns the given ids that have the topic (in the same order)."""
+        verses = self.get_verses(topic)[0]
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if len(verses) == 0 or len(ids) == 0:
+            return []
+        i = np.minimum(np.searchsorted(verses, ids), len(verses) - 1)
+        return ids[verses[i] == ids].tolist()
+
+def compile_topics(verses, path):
+    """Build the topic index from the topics of the verse store."""
+    topic_ptr_verse = verses.data["topic_ptr"]
+    raw = np.asarray(verses.data["topic"])
+    weight = weight_verse = np.asarray(verses.data["topic_weight"])
+    verse = np.repeat(np.arange(len(verses), dtype=np.int32), np.diff(topic_ptr_verse))
+
+    # Intern topics to ids and map every topic to its sanitised name
+    raw_ids, raw = np.unique(raw, return_inverse=True)
+    labels = [verses.strings[i] for i in raw_ids.tolist()]
+    names = sorted({sanitise(label) for label in labels})
+    lookup = {name: i for i, name in enumerate(names)}
+    name_of = np.array([lookup[sanitise(label)] for label in labels], dtype=np.int64)
+    topic = name_of[raw] if len(raw) else np.empty(0, dtype=np.int64)
+
+    # The label of a name is its first (sorted) topic
+    name_labels = [""] * len(names)
+    for label in sorted(labels, reverse=True):
+        name_labels[lookup[sanitise(label)]] = label
+
+    # Sort by topic, then verse. Each (topic, verse) keeps the highest weight.
+    order = np.lexsort((verse, topic))
+    topic, verse, weight = topic[order], verse[order], weight[order]
+    new = np.ones(len(topic), dtype=bool)
+    new[1:] = (topic[1:] != topic[:-1]) | (verse[1:] != verse[:-1])
+    starts = np.flatnonzero(new)
+    post_topic = topic[starts]
+    post_verse = verse[starts]
+    post_weight = np.maximum.reduceat(weight, starts).astype(np.int32) if len(starts) else np.empty(0, dtype=np.int32)
+
+    topic_ptr = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_topic, minlength=len(names)), out=topic_ptr[1:])
+
+    arrays = {"topic_ptr": topic_ptr, "post_verse": post_verse, "post_weight": post_weight}
+    arrays["verse_ptr"] = np.asarray(topic_ptr_verse, dtype=np.int64)
+    arrays["verse_topic"] = raw.astype(np.int32)
+    arrays["verse_weight"] = weight_verse.astype(np.int32)
+    arrays["topic"], arrays["topic_offsets"] = pack_strings(labels)
+    arrays["topic_name"] = name_of.astype(np.int32)
+    arrays["name"], arrays["name_offsets"] = pack_strings(names)
+    arrays["label"], arrays["label_offsets"] = pack_strings(name_labels)
+    write_packed(path, arrays, meta={"version": VERSION})
+
+def open_topics(verses, path=r"topics.bin"):
+    """Open the topic index, (re)building it first if it is missing or out of date."""
+    if is_stale(path, [verses.path], VERSION):
+        print("Building topic index...")
+        compile_topics(verses, path)
+
+    return TopicIndex(path)
+
+if __name__ == "__main__":
+    from verse_store import VerseStore
+    topics_path = r"topics.bin"
+
+    # Build the index (requires verses.bin)
+    verses = VerseStore(r"verses.bin")
+    compile_topics(verses, topics_path)
+    topics = TopicIndex(topics_path)
+    print(f"{len(topics)} topics. Top verses of 'kingdom of god': {topics.top_verses('kingdom of god', 5)}")
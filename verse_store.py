@@ -0,0 +1,154 @@
+import json
+import numpy as np
+from packed import write_packed, read_packed, is_stale, pack_strings, StringPool, Strings
+
+VERSION = 2
+SEPARATOR = " " # between the content of consecutive verses, so a passage is a single slice
+STRONGS_FIELDS = ["sn", "lemma", "translit", "type", "eng"]
+
+class VerseStore:
+    """A read-only store of verses, compiled from nodes.json and memory-mapped from disk.
+
+    Verses are only decoded when requested, so opening the store is (almost) free. The content of every verse
+    is stored in order, separated by SEPARATOR, so the content of verse i is content[offsets[i]:offsets[i+1] - len(SEPARATOR)]."""
+    def __init__(self, path=r"verses.bin"):
+        self.path = path
+        self.data, meta = read_packed(path)
+        self.strings = Strings(self.data["strings"], self.data["string_offsets"])
+
+    def __len__(self):
+        return len(self.data["name"])
+
+    def get_name(self, id):
+        return self.strings[self.data["name"][id]]
+
+    def get_book(self, id):
+        return self.strings[self.data["book"][id]]
+
+    def get_chap(self, id):
+        return self.strings[self.data["chap"][id]]
+
+    def get_verse(self, id):
+        return self.strings[self.data["verse"][id]]
+
+    def get_reference(self, id):
+        """Returns (book, chap, verse) of a verse."""
+        strings, data = self.strings, self.data
+        return strings[data["book"][id]], strings[data["chap"][id]], strings[data["verse"][id]]
+
+    def get_content(self, id):
+        return self.get_passage(id, id)
+
+    def get_passage(self, start, end):
+        """Returns the content of the verses from start to end (inclusive), separated by SEPARATOR."""
+        offsets = self.data["content_offsets"]
+        return str(self.data["content"][offsets[start]:offsets[end + 1] - len(SEPARATOR)].data, "utf-8")
+
+    def get_contents(self, start, end):
+        """Returns a list of the content of each verse from start to end (inclusive)."""
+        return [self.get_content(id) for id in range(start, end + 1)]
+
+    def get_topics(self, id):
+        """Returns a list of (topic, weight) tuples."""
+        start, end = self.data["topic_ptr"][id:id + 2]
+        topics = self.data["topic"][start:end]
+        weights = self.data["topic_weight"][start:end]
+        return [(self.strings[topic], int(weight)) for topic, weight in zip(topics, weights)]
+
+    def get_strongs(self, id):
+        """Returns a list of words, where each word is a dict of strongs data."""
+        start, end = self.data["word_ptr"][id:id + 2]
+        words = []
+        for i in range(start, end):
+            word = {}
+            for field in STRONGS_FIELDS:
+                value = self.data[f"word_{field}"][i]
+                if value != -1: # e.g. greek words do not have a type
+                    word[field] = self.strings[value]
+            word["stop_word"] = bool(self.data["word_stop"][i])
+            words.append(word)
+
+        return words
+
+    def get_node(self, id):
+        """Returns the node data of a given id (i.e. the same dict as nodes.json)."""
+        return {
+            "name": self.get_name(id),
+            "content": self.get_content(id),
+            "book": self.get_book(id),
+            "chap": self.get_chap(id),
+            "verse": self.get_verse(id),
+            "version": self.strings[self.data["version"][id]],
+            "id": id,
+            "topics": self.get_topics(id),
+            "strongs": self.get_strongs(id),
+        }
+
+def compile_verses(nodes_paths, path):
+    """Compile the nodes json into a verse store that can be memory-mapped."""
+    strings = StringPool()
+    columns = {x: [] for x in ["name", "book", "chap", "verse", "version"]}
+    contents = []
+    topic_ptr, topic, topic_weight = [0], [], []
+    word_ptr = [0]
+    words = {f"word_{field}": [] for field in STRONGS_FIELDS + ["stop"]}
+
+    # Read nodes in order of id
+    verses = []
+    for nodes_path in nodes_paths:
+        with open(nodes_path, 'r') as config_file:
+            verses += json.load(config_file)
+    verses.sort(key=lambda x: x[0])
+
+    for i, (id, data) in enumerate(verses):
+        if id != i:
+            raise ValueError(f"Verse ids must run from 0 to {len(verses) - 1}. Found {id} at {i}.")
+
+        # Columns
+        for key in columns:
+            columns[key].append(strings.add(data[key]))
+        contents.append(data["content"])
+
+        # Topics
+        for name, weight in data["topics"]:
+            topic.append(strings.add(name))
+            topic_weight.append(weight)
+        topic_ptr.append(len(topic))
+
+        # Strongs
+        for word in data["strongs"]:
+            for field in STRONGS_FIELDS:
+                words[f"word_{field}"].append(strings.add(word[field]) if field in word else -1)
+            words["word_stop"].append(word["stop_word"])
+        word_ptr.append(len(words["word_stop"]))
+
+    # Pack
+    arrays = {key: np.array(value, dtype=np.int32) for key, value in columns.items()}
+    arrays["strings"], arrays["string_offsets"] = strings.pack()
+    arrays["content"], arrays["content_offsets"] = pack_strings([content + SEPARATOR for content in contents])
+    arrays["topic_ptr"] = np.array(topic_ptr, dtype=np.int64)
+    arrays["topic"] = np.array(topic, dtype=np.int32)
+    arrays["topic_weight"] = np.array(topic_weight, dtype=np.int32)
+    arrays["word_ptr"] = np.array(word_ptr, dtype=np.int64)
+    for field in STRONGS_FIELDS:
+        arrays[f"word_{field}"] = np.array(words[f"word_{field}"], dtype=np.int32)
+    arrays["word_stop"] = np.array(words["word_stop"], dtype=np.uint8)
+
+    write_packed(path, arrays, meta={"version": VERSION})
+
+def open_verses(nodes_paths, path=r"verses.bin"):
+    """Open the verse store, (re)compiling it first if it is missing or out of date."""
+    if is_stale(path, nodes_paths, VERSION):
+        print("Compiling verses...")
+        compile_verses(nodes_paths, path)
+
+    return VerseStore(path)
+
+if __name__ == "__main__":
+    nodes_paths = [r"nodes1.json", r"nodes2.json", r"nodes3.json", r"nodes4.json"]
+    verses_path = r"verses.bin"
+
+    # Compile verses (e.g. before starting the web workers)
+    compile_verses(nodes_paths, verses_path)
+    store = VerseStore(verses_path)
+    print(f"{len(store)} verses. First verse: {store.get_node(0)}")